@@ -9,10 +9,10 @@ from datetime import datetime, timedelta
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from sqlalchemy import select, func, asc, desc, text
-from sqlalchemy.orm import Session
 
-from db import get_session
-from models import Product, FinanceDaily
+from db import get_session, create_all, is_local_sqlite
+from models import Base, Product, FinanceDaily
+from services import cursors, finance_summary as finance_cache
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Security / Config
@@ -30,6 +30,13 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+cursors.install_handler(app)   # malformed ?cursor= -> 400
+
+@app.on_event("startup")
+async def on_startup():
+    # A local SQLite db (LOCAL_DB_PATH / USE_LOCAL_SQLITE; tests, dev) has no migration step of its own
+    if is_local_sqlite():
+        await create_all(Base.metadata)
 
 def require_api_key(x_api_key: Optional[str] = Header(None)) -> None:
     if API_KEY and x_api_key != API_KEY:
@@ -46,6 +53,40 @@ def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
 def health() -> dict:
     return {"ok": True}
 
+# ────────────────────────────────────────────────────────────────────────────────
+# Keyset pagination
+# List endpoints order by (sort column, id) and return
+# {"items": [...], "next_cursor": ...} (null on the last page). Cursors
+# (services/cursors.py) carry [sort, dir, last value, last id], so one
+# cannot be replayed against a different ordering. `offset` still works
+# but costs O(offset); pass `cursor` instead for deep pages.
+# ────────────────────────────────────────────────────────────────────────────────
+def _after(cursor: Optional[str], sort: str, direction: str, conv):
+    """(last value, last id) from a cursor issued for the same sort."""
+    return tuple(cursors.decode(cursor, (conv, int), tag=(sort, direction))) if cursor else None
+
+def _keyset(stmt, col, id_col, direction: str, after):
+    """Order stmt by (col, id) with NULLs last and start after `after`."""
+    desc_ = direction == "desc"
+    order = desc if desc_ else asc
+    stmt = stmt.order_by(order(col).nulls_last(), order(id_col))
+    if after is not None:
+        value, last_id = after
+        past_id = id_col < last_id if desc_ else id_col > last_id
+        if value is None:
+            stmt = stmt.where(col.is_(None), past_id)
+        else:
+            past = col < value if desc_ else col > value
+            stmt = stmt.where(past | ((col == value) & past_id) | col.is_(None))
+    return stmt
+
+def _page_rows(rows, limit: int, cursor_of):
+    """(page rows, next cursor or None) from a limit + 1 fetch."""
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, cursor_of(rows[-1])
+    return rows, None
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Products
 # ────────────────────────────────────────────────────────────────────────────────
@@ -58,47 +99,59 @@ class ProductOut(BaseModel):
 class CountOut(BaseModel):
     count: int
 
+class ProductPageOut(BaseModel):
+    items: List[ProductOut]
+    next_cursor: Optional[str] = None
+
 _SORTABLE_PRODUCT_COLUMNS = {
     "id": Product.id,
     "asin": Product.asin,
     "title": Product.title,
     "price": Product.price,
 }
+_PRODUCT_KEY_TYPES = {"id": int, "asin": str, "title": str, "price": float}
 
-@app.get("/v1/products", dependencies=[Depends(require_api_key)], response_model=List[ProductOut])
-def list_products(
+@app.get("/v1/products", dependencies=[Depends(require_api_key)], response_model=ProductPageOut)
+async def list_products(
     limit: int = Query(50, ge=1, le=2000),
     offset: int = Query(0, ge=0),
     sort_by: Literal["id", "asin", "title", "price"] = "id",
     sort_dir: Literal["asc", "desc"] = "asc",
+    cursor: Optional[str] = None,
 ):
     sort_col = _SORTABLE_PRODUCT_COLUMNS.get(sort_by, Product.id)
-    order = asc(sort_col) if sort_dir == "asc" else desc(sort_col)
-    with get_session() as sess:
-        rows = (
-            sess.execute(
-                select(Product).order_by(order).offset(offset).limit(limit)
-            )
-            .scalars()
-            .all()
-        )
-    return [ProductOut(id=r.id, asin=r.asin, title=r.title, price=r.price) for r in rows]
+    after = _after(cursor, sort_by, sort_dir, _PRODUCT_KEY_TYPES[sort_by])
+    stmt = _keyset(select(Product), sort_col, Product.id, sort_dir, after)
+    if after is None and offset:
+        stmt = stmt.offset(offset)
+    async with get_session() as sess:
+        rows = (await sess.execute(stmt.limit(limit + 1))).scalars().all()
+    rows, nxt = _page_rows(rows, limit, lambda r: cursors.encode([getattr(r, sort_by), r.id], tag=(sort_by, sort_dir)))
+    return ProductPageOut(items=[ProductOut(id=r.id, asin=r.asin, title=r.title, price=r.price) for r in rows],
+                          next_cursor=nxt)
 
 @app.get("/v1/products/count", dependencies=[Depends(require_api_key)], response_model=CountOut)
-def products_count():
-    with get_session() as sess:
-        total = sess.query(func.count(Product.id)).scalar() or 0
+async def products_count():
+    async with get_session() as sess:
+        total = await sess.scalar(select(func.count(Product.id))) or 0
     return CountOut(count=int(total))
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Finance
 # ────────────────────────────────────────────────────────────────────────────────
-class FinanceSummaryOut(BaseModel):
+class FinanceWindowOut(BaseModel):
+    units: int = 0
     revenue: float
     gross_profit: float
     net_profit: float
+    ad_spend: float = 0.0
     acos_pct: float
 
+class FinanceSummaryOut(FinanceWindowOut):
+    # Rolling windows ending today, keyed "7d", "30d", ... (VEGA_FINANCE_WINDOWS)
+    windows: dict[str, FinanceWindowOut] = {}
+    as_of: Optional[str] = None
+
 class FinanceDailyOut(BaseModel):
     date: datetime
     units: int | None = 0
@@ -108,36 +161,32 @@ class FinanceDailyOut(BaseModel):
     ad_spend: float | None = 0.0
 
 @app.get("/v1/finance/summary", dependencies=[Depends(require_api_key)], response_model=FinanceSummaryOut)
-def finance_summary():
-    with get_session() as sess:
-        rev  = sess.query(func.coalesce(func.sum(FinanceDaily.revenue), 0.0)).scalar() or 0.0
-        cogs = sess.query(func.coalesce(func.sum(FinanceDaily.cogs), 0.0)).scalar() or 0.0
-        fees = sess.query(func.coalesce(func.sum(FinanceDaily.fees), 0.0)).scalar() or 0.0
-        ads  = sess.query(func.coalesce(func.sum(FinanceDaily.ad_spend), 0.0)).scalar() or 0.0
-    gross = rev - cogs - fees
-    net   = gross - ads
-    acos  = (ads / rev * 100.0) if rev > 1e-9 else 0.0
-    return FinanceSummaryOut(revenue=rev, gross_profit=gross, net_profit=net, acos_pct=acos)
-
-@app.get("/v1/finance/daily", dependencies=[Depends(require_api_key)], response_model=List[FinanceDailyOut])
-def finance_daily(
+async def finance_summary():
+    # One aggregate pass, then served from memory until finance_daily changes
+    return FinanceSummaryOut(**await finance_cache.get(get_session))
+
+class FinanceDailyPageOut(BaseModel):
+    items: List[FinanceDailyOut]
+    next_cursor: Optional[str] = None
+
+@app.get("/v1/finance/daily", dependencies=[Depends(require_api_key)], response_model=FinanceDailyPageOut)
+async def finance_daily(
     limit: int = Query(60, ge=1, le=10000),
     offset: int = Query(0, ge=0),
     sort: Literal["asc", "desc"] = "desc",
+    cursor: Optional[str] = None,
 ):
-    order = desc(FinanceDaily.date) if sort == "desc" else asc(FinanceDaily.date)
-    with get_session() as sess:
-        rows = (
-            sess.execute(
-                select(FinanceDaily).order_by(order).offset(offset).limit(limit)
-            )
-            .scalars()
-            .all()
-        )
+    after = _after(cursor, "date", sort, datetime.fromisoformat)
+    stmt = _keyset(select(FinanceDaily), FinanceDaily.date, FinanceDaily.id, sort, after)
+    if after is None and offset:
+        stmt = stmt.offset(offset)
+    async with get_session() as sess:
+        rows = (await sess.execute(stmt.limit(limit + 1))).scalars().all()
+    rows, nxt = _page_rows(rows, limit, lambda r: cursors.encode([r.date, r.id], tag=("date", sort)))
     # If user asked for DESC, return oldest→newest for charts
     if sort == "desc":
         rows = list(reversed(rows))
-    return [
+    items = [
         FinanceDailyOut(
             date=r.date,
             units=r.units,
@@ -148,13 +197,75 @@ def finance_daily(
         )
         for r in rows
     ]
+    return FinanceDailyPageOut(items=items, next_cursor=nxt)
 
 @app.get("/v1/finance/daily/count", dependencies=[Depends(require_api_key)], response_model=CountOut)
-def finance_daily_count():
-    with get_session() as sess:
-        total = sess.query(func.count(FinanceDaily.id)).scalar() or 0
+async def finance_daily_count():
+    async with get_session() as sess:
+        total = await sess.scalar(select(func.count(FinanceDaily.id))) or 0
     return CountOut(count=int(total))
 
+# ────────────────────────────────────────────────────────────────────────────────
+# Streaming exports (NDJSON / CSV / Arrow IPC) for notebooks and BI pulls
+# Rows stream from a server-side cursor in VEGA_EXPORT_CHUNK_ROWS chunks
+# straight into the encoder: no models, no full result list in memory.
+# ────────────────────────────────────────────────────────────────────────────────
+from fastapi.responses import StreamingResponse
+from services import streaming_export
+
+_FINANCE_EXPORT_COLUMNS = (("id", "int"), ("date", "ts"), ("units", "int"), ("revenue", "float"),
+                           ("cogs", "float"), ("fees", "float"), ("ad_spend", "float"))
+_PRODUCT_EXPORT_COLUMNS = (("id", "int"), ("asin", "str"), ("title", "str"), ("price", "float"),
+                           ("created_at", "ts"), ("updated_at", "ts"))
+ExportFormat = Literal["ndjson", "csv", "arrow"]
+
+def _export(name, model, columns, date_col, order, start, end, fmt) -> StreamingResponse:
+    try:
+        lo = datetime.fromisoformat(start[:10]) if start else None
+        hi = datetime.fromisoformat(end[:10]) + timedelta(days=1) if end else None  # end day inclusive
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start/end must be YYYY-MM-DD")
+    if fmt == "arrow" and not streaming_export.PYARROW_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Arrow export needs pyarrow on the server")
+    stmt = select(*(getattr(model, n) for n, _ in columns)).order_by(*order)
+    if lo is not None:
+        stmt = stmt.where(date_col >= lo)
+    if hi is not None:
+        stmt = stmt.where(date_col < hi)
+
+    async def chunks():
+        # yield_per = stream_results + fetchmany: a server-side cursor on
+        # Postgres, so only one chunk of rows is ever buffered
+        async with get_session() as sess:
+            result = await sess.stream(stmt.execution_options(yield_per=streaming_export.CHUNK_ROWS))
+            async for part in result.partitions():
+                yield part
+
+    filename = f"{name}.{streaming_export.EXTENSIONS[fmt]}"
+    return StreamingResponse(
+        streaming_export.encode(fmt, columns, chunks()),
+        media_type=streaming_export.MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+@app.get("/v1/export/finance_daily", dependencies=[Depends(require_api_key)])
+async def export_finance_daily(
+    start: Optional[str] = Query(None, description="YYYY-MM-DD, inclusive"),
+    end: Optional[str] = Query(None, description="YYYY-MM-DD, inclusive"),
+    format: ExportFormat = "ndjson",
+):
+    return _export("finance_daily", FinanceDaily, _FINANCE_EXPORT_COLUMNS, FinanceDaily.date,
+                   (FinanceDaily.date, FinanceDaily.id), start, end, format)
+
+@app.get("/v1/export/products", dependencies=[Depends(require_api_key)])
+async def export_products(
+    start: Optional[str] = Query(None, description="updated_at from, YYYY-MM-DD"),
+    end: Optional[str] = Query(None, description="updated_at to, YYYY-MM-DD, inclusive"),
+    format: ExportFormat = "ndjson",
+):
+    return _export("products", Product, _PRODUCT_EXPORT_COLUMNS, Product.updated_at,
+                   (Product.id,), start, end, format)
+
 # ────────────────────────────────────────────────────────────────────────────────
 # Admin-only seed (keep in prod but behind ADMIN_TOKEN)
 # ────────────────────────────────────────────────────────────────────────────────
@@ -162,11 +273,11 @@ def finance_daily_count():
     "/ops/seed_finance_demo",
     dependencies=[Depends(require_api_key), Depends(require_admin)],
 )
-def seed_finance_demo(days: int = 30):
+async def seed_finance_demo(days: int = 30):
     """Populate demo finance data (requires both API_KEY and ADMIN_TOKEN)."""
     import random
     now = datetime.utcnow().date()
-    with get_session() as sess:
+    async with get_session() as sess:
         for i in range(days, 0, -1):
             d = datetime.combine(now - timedelta(days=i), datetime.min.time())
             base = 1000 + random.randint(-120, 120)
@@ -184,60 +295,71 @@ def seed_finance_demo(days: int = 30):
                     ad_spend=ads,
                 )
             )
-        sess.commit()
+        await sess.commit()
     return {"ok": True, "seeded_days": days}
 
 # ────────────────────────────────────────────────────────────────────────────────
 # Amazon Ads live refresh + counts
 # ────────────────────────────────────────────────────────────────────────────────
-from services.amazon_ads_service import _db, _init_db, fetch_metrics, fetch_search_terms, fetch_placements
+from services.amazon_ads_service import _db, _init_db
+from services import ads_refresh_jobs
+
+class AdsRefreshReportOut(BaseModel):
+    profile_id: str
+    kind: str
+    ad_type: str
+    stage: str                     # PENDING, COMPLETED, PERSISTING, DOWNLOADED, PERSISTED, FAILED, TIMED_OUT
+    report_id: Optional[str] = None
+    start: Optional[str] = None
+    end: Optional[str] = None
+    rows: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    error: Optional[str] = None
+    updated_at: Optional[str] = None
 
-class AdsRefreshOut(BaseModel):
-    ok: bool
-    inserted_metrics: int
-    inserted_search_terms: int
-    inserted_placements: int
+class AdsRefreshJobOut(BaseModel):
+    job_id: str
+    status: str                    # QUEUED, RUNNING, SUCCEEDED, PARTIAL, FAILED
+    coalesced: bool = False        # this request joined an identical job in flight
     window_start: str
     window_end: str
+    ad_types: List[str]
+    profile_id: Optional[str] = None
+    incremental: bool = True
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    reports: List[AdsRefreshReportOut] = []
+    totals: Optional[dict] = None  # per kind: rows/inserted/updated/unchanged, once finished
 
-@app.post("/v1/ads/refresh", dependencies=[Depends(require_api_key)], response_model=AdsRefreshOut)
-def ads_refresh(days: int = 30, types: Optional[str] = "SP,SB"):
-    _init_db()
-    from datetime import datetime, timedelta
+@app.post("/v1/ads/refresh", dependencies=[Depends(require_api_key)], response_model=AdsRefreshJobOut,
+          status_code=202)
+def ads_refresh(days: int = 30, types: Optional[str] = "SP,SB", incremental: bool = True,
+                profile_id: Optional[str] = None):
+    # Queues the refresh and returns at once; poll GET /v1/ads/refresh/{job_id}
     end = datetime.utcnow().date()
     start = end - timedelta(days=days)
     start_s, end_s = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
-    inserted = {"metrics": 0, "search_terms": 0, "placements": 0}
     ad_types = [t.strip().upper() for t in (types or "SP,SB").split(",") if t.strip()]
-    for t in ad_types:
-        try:
-            m = fetch_metrics(t, start_s, end_s) or []
-            inserted["metrics"] += len(m)
-        except Exception as e:
-            print(f"[WARN] fetch_metrics {t}: {e}")
-        try:
-            s = fetch_search_terms(t, start_s, end_s) or []
-            inserted["search_terms"] += len(s)
-        except Exception as e:
-            print(f"[WARN] fetch_search_terms {t}: {e}")
-        try:
-            p = fetch_placements(t, start_s, end_s) or []
-            inserted["placements"] += len(p)
-        except Exception as e:
-            print(f"[WARN] fetch_placements {t}: {e}")
-    return AdsRefreshOut(
-        ok=True,
-        inserted_metrics=inserted["metrics"],
-        inserted_search_terms=inserted["search_terms"],
-        inserted_placements=inserted["placements"],
-        window_start=start_s,
-        window_end=end_s,
-    )
+    # incremental: `days` is only the floor; each report resumes from its watermark
+    job, coalesced = ads_refresh_jobs.submit(start_s, end_s, ad_types, profile_id=profile_id, incremental=incremental)
+    return AdsRefreshJobOut(**{**job, "coalesced": coalesced})
+
+@app.get("/v1/ads/refresh/{job_id}", dependencies=[Depends(require_api_key)], response_model=AdsRefreshJobOut)
+def ads_refresh_status(job_id: str):
+    job = ads_refresh_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown refresh job")
+    return AdsRefreshJobOut(**{**job, "coalesced": job["coalesced"] > 0})
 
 class AdsCountOut(BaseModel):
     metrics: int
     search_terms: int
     placements: int
+    keywords: int
 
 @app.get("/v1/ads/metrics/count", dependencies=[Depends(require_api_key)], response_model=AdsCountOut)
 def ads_metrics_count():
@@ -253,4 +375,57 @@ def ads_metrics_count():
         metrics=_count("metrics"),
         search_terms=_count("search_terms"),
         placements=_count("placements"),
+        keywords=_count("keywords"),
     )
+
+# ────────────────────────────────────────────────────────────────────────────────
+# Amazon Ads reads: filtered / grouped, keyset-paginated
+# ────────────────────────────────────────────────────────────────────────────────
+from services import ads_db, ads_query
+
+class AdsPageOut(BaseModel):
+    items: List[dict]
+    next_cursor: Optional[str] = None
+
+def _csv(v: Optional[str]) -> Optional[List[str]]:
+    out = [x.strip() for x in (v or "").split(",") if x.strip()]
+    return out or None
+
+def _ads_page(kind, start, end, ad_type, campaign_id, profile_id, group_by, limit, cursor) -> AdsPageOut:
+    try:
+        end_d = datetime.fromisoformat(end).date() if end else datetime.utcnow().date()
+        start_d = datetime.fromisoformat(start).date() if start else end_d - timedelta(days=30)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="start/end must be YYYY-MM-DD")
+    _init_db()
+    con = _db()
+    try:
+        items, nxt = ads_query.query(
+            con, kind, ads_db.to_day(start_d), ads_db.to_day(end_d),
+            ad_types=_csv(ad_type), campaign_ids=_csv(campaign_id), profile_id=profile_id,
+            group_by=group_by, limit=limit, cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        con.close()
+    return AdsPageOut(items=items, next_cursor=nxt)
+
+def _ads_endpoint(kind):
+    # Pass next_cursor back as ?cursor= (same filters) for the following page
+    def endpoint(
+        start: Optional[str] = Query(None, description="YYYY-MM-DD, default end - 30 days"),
+        end: Optional[str] = Query(None, description="YYYY-MM-DD, default today (UTC)"),
+        ad_type: Optional[str] = Query(None, description="Comma list, e.g. SP,SB"),
+        campaign_id: Optional[str] = Query(None, description="Comma list of campaignIds"),
+        profile_id: Optional[str] = None,
+        group_by: Optional[Literal["day", "week", "month", "campaign"]] = None,
+        limit: int = Query(500, ge=1, le=5000),
+        cursor: Optional[str] = None,
+    ):
+        return _ads_page(kind, start, end, ad_type, campaign_id, profile_id, group_by, limit, cursor)
+    endpoint.__name__ = f"ads_{kind}"
+    return endpoint
+
+for _kind in ads_query.KINDS:
+    app.get(f"/v1/ads/{_kind}", dependencies=[Depends(require_api_key)], response_model=AdsPageOut)(_ads_endpoint(_kind))
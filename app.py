@@ -198,8 +198,8 @@ with right:
         st.success("Live data loaded")
         try:
             import pandas as pd
-            if isinstance(payload, list):
-                st.dataframe(pd.DataFrame(payload), use_container_width=True)   # ✅ fixed
+            if isinstance(payload, dict) and isinstance(payload.get("items"), list):
+                st.dataframe(pd.DataFrame(payload["items"]), use_container_width=True)   # ✅ fixed
             else:
                 st.code(_fmt(payload), language="json")
         except Exception:
@@ -4,8 +4,9 @@ from fastapi import FastAPI, Depends, HTTPException, Header, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
-from backend.db import engine, Base, SessionLocal
-from backend.schemas import ProductOut, ProductIn
+from backend.db import Base, create_all, get_db
+from backend.schemas import ProductOut, ProductIn, ProductPageOut
+from services import cursors
 from backend.crud import list_products, create_product, list_compliance, list_research
 from backend.debug_ads import check_ads_env, get_access_token, ping_ads_profiles, ping_ads_campaigns
 
@@ -21,15 +22,11 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-
-async def get_db() -> AsyncSession:
-    async with SessionLocal() as session:
-        yield session
+cursors.install_handler(app)   # malformed ?cursor= -> 400
 
 @app.on_event("startup")
 async def on_startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await create_all(Base.metadata)
 
 @app.get("/health")
 async def health(db: AsyncSession = Depends(get_db)):
@@ -39,13 +36,16 @@ async def health(db: AsyncSession = Depends(get_db)):
     except Exception as e:
         return {"ok": False, "env": APP_ENV, "db_ok": False, "error": str(e)}
 
-@app.get("/v1/products", response_model=List[ProductOut])
+@app.get("/v1/products", response_model=ProductPageOut)
 async def api_list_products(
     limit: int = Query(50, ge=1, le=500),
     q: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db)
 ):
-    return await list_products(db, limit=limit, q=q)
+    # Next page: pass next_cursor back as ?cursor= (same q)
+    rows, next_cursor = await list_products(db, limit=limit, q=q, cursor=cursor)
+    return ProductPageOut(items=rows, next_cursor=next_cursor)
 
 @app.post("/v1/products", response_model=ProductOut)
 async def api_create_product(
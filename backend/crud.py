@@ -1,20 +1,41 @@
-from typing import List, Optional
-from sqlalchemy import select, desc, or_
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import select, desc, or_, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from backend.models import Product, Compliance, ProductResearch
+from services import cursors
 
-async def list_products(db: AsyncSession, limit:int=50, q:Optional[str]=None) -> List[Product]:
+# Products page newest first by (updated_at, id); the cursor
+# (services/cursors.py) holds the last row's [updated_at, id], so every page
+# is one index seek
+async def list_products(db: AsyncSession, limit:int=50, q:Optional[str]=None,
+                        cursor:Optional[str]=None) -> Tuple[List[Product], Optional[str]]:
+    """One page of products and the cursor of the next page (None on the last)."""
     limit = max(1, min(limit, 500))
-    stmt = select(Product).order_by(desc(Product.updated_at)).limit(limit)
+    stmt = select(Product).order_by(desc(Product.updated_at).nulls_last(), desc(Product.id))
     if q:
         like = f"%{q}%"
-        stmt = select(Product).where(or_(
+        stmt = stmt.where(or_(
             Product.asin.ilike(like),
             Product.sku.ilike(like),
             Product.title.ilike(like),
             Product.brand.ilike(like),
-        )).order_by(desc(Product.updated_at)).limit(limit)
-    return (await db.execute(stmt)).scalars().all()
+        ))
+    if cursor:
+        updated_at, last_id = cursors.decode(cursor, (datetime.fromisoformat, int))
+        if updated_at is None:
+            stmt = stmt.where(Product.updated_at.is_(None), Product.id < last_id)
+        else:
+            stmt = stmt.where(or_(
+                Product.updated_at < updated_at,
+                and_(Product.updated_at == updated_at, Product.id < last_id),
+                Product.updated_at.is_(None),
+            ))
+    rows = (await db.execute(stmt.limit(limit + 1))).scalars().all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, cursors.encode([rows[-1].updated_at, rows[-1].id])
+    return rows, None
 
 async def create_product(db: AsyncSession, **kwargs) -> Product:
     p = Product(**kwargs)
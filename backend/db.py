@@ -1,12 +1,15 @@
-import os
-from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+# backend/db.py
+# The backend shares the root data-access layer (db.py): same engine, pool
+# settings and statement cache. Only its declarative Base lives here.
 from sqlalchemy.orm import DeclarativeBase
-
-DATABASE_URL = os.getenv("DATABASE_URL","")
-if DATABASE_URL.startswith("postgresql://"):
-    DATABASE_URL = DATABASE_URL.replace("postgresql://","postgresql+asyncpg://",1)
+from db import get_engine, get_sessionmaker, get_session, get_db, create_all
 
 class Base(DeclarativeBase): pass
 
-engine = create_async_engine(DATABASE_URL, pool_pre_ping=True)
-SessionLocal = async_sessionmaker(bind=engine, autoflush=False, expire_on_commit=False, class_=AsyncSession)
+def __getattr__(name):
+    # Older imports: `from backend.db import engine, SessionLocal`
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        return get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,4 +1,5 @@
 import os, requests
+from services import lwa_tokens
 
 def _has_value(v: str | None) -> bool:
     return bool(v) and v.strip().lower() not in {"", "value", "xxxxx"}
@@ -23,19 +24,7 @@ def get_access_token():
     if not all([client_id, client_secret, refresh_token]): 
         return False, "missing LWA credentials"
     try:
-        r = requests.post(
-            "https://api.amazon.com/auth/o2/token",
-            data={
-                "grant_type": "refresh_token",
-                "refresh_token": refresh_token,
-                "client_id": client_id,
-                "client_secret": client_secret,
-            },
-            timeout=20,
-        )
-        if r.status_code != 200:
-            return False, f"{r.status_code} {r.text[:300]}"
-        return True, r.json()["access_token"]
+        return True, lwa_tokens.get_access_token(client_id, client_secret, refresh_token)
     except Exception as e:
         return False, str(e)
 
@@ -1,5 +1,6 @@
+from datetime import datetime
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 class ProductOut(BaseModel):
     id: int
@@ -13,10 +14,14 @@ class ProductOut(BaseModel):
     inventory: Optional[int] = None
     reviews: Optional[int] = None
     stars: Optional[float] = None
-    updated_at: Optional[str] = None
+    updated_at: Optional[datetime] = None
     class Config:
         from_attributes = True
 
+class ProductPageOut(BaseModel):
+    items: List[ProductOut]
+    next_cursor: Optional[str] = None
+
 class ProductIn(BaseModel):
     asin: Optional[str] = None
     sku: Optional[str] = None
@@ -1,24 +1,131 @@
 # db.py
+# Shared async data access for api.py and backend/app.py: one engine per
+# process with an explicitly sized pool and asyncpg prepared-statement
+# caching. DATABASE_URL is required; tests and local runs opt into a local
+# SQLite (aiosqlite) db with LOCAL_DB_PATH=<file> or USE_LOCAL_SQLITE=1.
+#
+#   async with get_session() as sess:
+#       rows = (await sess.execute(stmt)).scalars().all()
+#
+# FastAPI endpoints can depend on get_db instead.
 import os
+from contextlib import asynccontextmanager
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.pool import StaticPool
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-# Accept both async & sync URLs; if sync, translate psycopg → asyncpg
-if DATABASE_URL and DATABASE_URL.startswith("postgresql://"):
-    DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+# Pool sizing: POOL_SIZE kept open, up to MAX_OVERFLOW more under bursts;
+# connections are recycled before server/proxy idle timeouts cut them
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Prepared statements cached per asyncpg connection; set 0 behind PgBouncer
+# in transaction mode, which cannot keep them across transactions
+STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "500"))
+DEFAULT_LOCAL_DB = "cockpit_local.db"
+
+class DatabaseConfigError(RuntimeError):
+    pass
+
+def _local_db_path():
+    path = os.getenv("LOCAL_DB_PATH", "").strip()
+    if path:
+        return path
+    if os.getenv("USE_LOCAL_SQLITE", "").strip().lower() in ("1", "true", "yes"):
+        return DEFAULT_LOCAL_DB
+    return None
+
+def database_url() -> str:
+    """DATABASE_URL with an async driver, or the local SQLite db when opted into."""
+    url = os.getenv("DATABASE_URL", "").strip()
+    if not url:
+        path = _local_db_path()
+        if path is None:
+            # A missing secret must not quietly serve an empty local db
+            raise DatabaseConfigError("DATABASE_URL is not set; set it, or set LOCAL_DB_PATH=<file> "
+                                      "or USE_LOCAL_SQLITE=1 to use a local SQLite database")
+        return f"sqlite+aiosqlite:///{path}"
+    # Accept both async & sync URLs; if sync, translate to the async driver
+    for prefix in ("postgres://", "postgresql://", "postgresql+psycopg2://", "postgresql+psycopg://"):
+        if url.startswith(prefix):
+            return "postgresql+asyncpg://" + url[len(prefix):]
+    if url.startswith("sqlite://"):
+        return "sqlite+aiosqlite://" + url[len("sqlite://"):]
+    return url
 
 class Base(DeclarativeBase):
     pass
 
-engine = create_async_engine(
-    DATABASE_URL,
-    pool_pre_ping=True,
-)
-
-SessionLocal = async_sessionmaker(
-    bind=engine,
-    autoflush=False,
-    expire_on_commit=False,
-    class_=AsyncSession,
-)
+_engine = None
+_sessionmaker = None
+
+def _engine_kwargs(url: str) -> dict:
+    if url.startswith("sqlite"):
+        if ":memory:" in url or url.endswith("://"):
+            # One shared connection, or every session would see its own empty db
+            return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+        return {"pool_size": POOL_SIZE, "max_overflow": MAX_OVERFLOW, "pool_timeout": POOL_TIMEOUT}
+    kw = {
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT,
+        "pool_recycle": POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+    if url.startswith("postgresql+asyncpg"):
+        kw["connect_args"] = {"statement_cache_size": STATEMENT_CACHE}
+        # SQLAlchemy's own cache of asyncpg prepared statements per connection
+        kw["connect_args"]["prepared_statement_cache_size"] = STATEMENT_CACHE
+    return kw
+
+def get_engine():
+    """The process-wide AsyncEngine, created on first use."""
+    global _engine
+    if _engine is None:
+        url = database_url()
+        _engine = create_async_engine(url, **_engine_kwargs(url))
+    return _engine
+
+def get_sessionmaker():
+    global _sessionmaker
+    if _sessionmaker is None:
+        _sessionmaker = async_sessionmaker(
+            bind=get_engine(),
+            autoflush=False,
+            expire_on_commit=False,
+            class_=AsyncSession,
+        )
+    return _sessionmaker
+
+@asynccontextmanager
+async def get_session():
+    async with get_sessionmaker()() as session:
+        yield session
+
+async def get_db():
+    """FastAPI dependency: one AsyncSession per request."""
+    async with get_session() as session:
+        yield session
+
+async def create_all(*metadatas):
+    async with get_engine().begin() as conn:
+        for metadata in metadatas:
+            await conn.run_sync(metadata.create_all)
+
+async def dispose():
+    global _engine, _sessionmaker
+    if _engine is not None:
+        await _engine.dispose()
+    _engine = _sessionmaker = None
+
+def is_local_sqlite() -> bool:
+    return database_url().startswith("sqlite")
+
+def __getattr__(name):
+    # Older imports: `from db import engine, SessionLocal`
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        return get_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,9 @@
-from db import get_engine
+import asyncio
+from db import create_all
 from models import Base
 
 def init():
-    engine = get_engine()
-    Base.metadata.create_all(engine)
+    asyncio.run(create_all(Base.metadata))
     print("✅ DB tables created (or already exist).")
 
 if __name__ == "__main__":
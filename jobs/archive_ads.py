@@ -0,0 +1,5 @@
+# Move ads history older than VEGA_ADS_ARCHIVE_AFTER_DAYS (whole months) out
+# of vega_ads.db into the Parquet archive; see services/ads_archive.py.
+from services.ads_archive import archive_all
+moved=archive_all()
+print('Archived', sum(moved.values()), 'rows', moved)
@@ -1,4 +1,7 @@
-import os,gzip,shutil
-DB=os.path.join(os.getenv('VEGA_DATA_DIR','/data'),'vega_ads.db'); out=os.path.join(os.getenv('VEGA_DATA_DIR','/data'),'backups'); os.makedirs(out,exist_ok=True)
-with open(DB,'rb') as fi, gzip.open(os.path.join(out,'vega_ads-backup.db.gz'),'wb') as fo: shutil.copyfileobj(fi,fo)
-print('Backed up')
+# Consistent, compressed backup of vega_ads.db taken while writers run.
+# `python jobs/backup_db.py --delta` stores only pages changed since the last
+# backup (a full image every VEGA_ADS_BACKUP_FULL_EVERY runs); see
+# services/ads_backup.py.
+import sys
+from services.ads_backup import backup
+print('Backed up', backup(delta='--delta' in sys.argv[1:]))
@@ -1,4 +1,4 @@
-from services.amazon_ads_service import fetch_metrics
+from services.amazon_ads_service import run_reports
 from datetime import date,timedelta
-rows=fetch_metrics(date.today()-timedelta(days=34),date.today())
-print('Cache rows:',len(rows))
+res=run_reports(date.today()-timedelta(days=34),date.today(),kinds=('metrics',))
+print('Cache rows:',res['metrics']['rows'])
@@ -1,3 +1,6 @@
-import sqlite3,os
-DB=os.path.join(os.getenv('VEGA_DATA_DIR','/data'),'vega_ads.db')
-con=sqlite3.connect(DB); con.execute('VACUUM'); con.close(); print('Vacuumed')
+# Retention, bounded incremental vacuum and PRAGMA optimize for vega_ads.db.
+# Runs next to live readers (no full VACUUM); see services/ads_maintenance.py.
+# VEGA_ADS_VACUUM_CONVERT=1 also does the one-time auto_vacuum=INCREMENTAL
+# conversion of an older file: a full VACUUM, so run it in a quiet window.
+from services.ads_maintenance import run
+print('Maintenance', run())
@@ -0,0 +1,5 @@
+# Convert a pre-v2 vega_ads.db (TEXT dates/ids, REAL counters) to the v2
+# layout. Safe to re-run and to interrupt; the service's first database use
+# also migrates, this just makes it an explicit step before a deploy.
+from services.amazon_ads_service import migrate_ads_db
+print('Migrated', migrate_ads_db(), 'rows')
@@ -1,4 +1,4 @@
-from services.amazon_ads_service import fetch_metrics
+from services.amazon_ads_service import run_reports
 from datetime import date,timedelta
-rows=fetch_metrics(date.today()-timedelta(days=6),date.today())
-print('Daily rows:',len(rows))
+res=run_reports(date.today()-timedelta(days=6),date.today(),kinds=('metrics',))
+print('Daily rows:',res['metrics']['rows'])
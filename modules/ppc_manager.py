@@ -66,9 +66,16 @@ def ppc_manager_view():
         c3.download_button("PDF", simple_pdf_bytes("PPC Metrics", df), file_name="ppc_metrics.pdf")
 
     # --- Optimizer (optional) ---
+    # Bid rules prefer the keyword reports stored by the ads ingestion
+    try:
+        from services.amazon_ads_service import keyword_performance
+        end = pd.Timestamp.today().date()
+        kw_df = keyword_performance(end - timedelta(days=13), end)
+    except Exception:
+        kw_df = pd.DataFrame()
     try:
         g = guardrails(df)
-        b = bid_rules(df)
+        b = bid_rules(kw_df if not kw_df.empty else df)
         n = negatives(df)
         actions_df = actions_to_df(g, b, n)
 
@@ -8,7 +8,7 @@ q = st.text_input("Search (ASIN, SKU, Title, Brand)", ""); limit = st.number_inp
 if not API_URL: st.error("API_URL not set"); 
 else:
     try:
-        data = api_get("/v1/products", limit=int(limit), q=q or None)
+        data = api_get("/v1/products", limit=int(limit), q=q or None)["items"]
         df = pd.DataFrame(data)
         if df.empty: st.info("No products yet. Insert into `products` table."); 
         else:
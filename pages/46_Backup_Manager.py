@@ -1,7 +1,6 @@
 # pages/46_Backup_Manager.py
 import streamlit as st
-import os, gzip, shutil
-from datetime import datetime
+import os
 from pathlib import Path
 
 st.set_page_config(page_title="Backup Manager", layout="wide")
@@ -36,13 +35,11 @@ if error_banner:
     st.error(error_banner)
 
 def create_backup():
-    ts = datetime.utcnow().strftime("%Y%m%d_%H%M%S")
-    out = BACKUPS / f"vega_ads-{ts}.db.gz"
     if not DB_PATH.exists():
         raise FileNotFoundError(f"Database not found: {DB_PATH}")
-    with open(DB_PATH, "rb") as fin, gzip.open(out, "wb") as fout:
-        shutil.copyfileobj(fin, fout)
-    return out
+    # Online backup API: consistent even while ingestion is writing
+    from services.ads_backup import backup
+    return BACKUPS / backup(str(DB_PATH), str(BACKUPS))["file"]
 
 colA, colB = st.columns([1,1])
 with colA:
@@ -59,41 +56,66 @@ with colB:
 
 # ----- Existing Backups -----
 st.subheader("Existing Backups")
-files = []
+from services import ads_backup
+items = []
 try:
-    files = sorted(BACKUPS.glob("*.gz"), key=lambda p: p.stat().st_mtime, reverse=True)
+    items = ads_backup.artefacts(str(BACKUPS))[::-1]   # newest first
 except Exception as e:
     st.error(f"Cannot list backups in {BACKUPS}: {e}")
 
-if not files:
+if not items:
     st.info("No backups yet.")
 else:
     rows = []
-    for p in files:
+    for a in items:
         try:
-            stat = p.stat()
             rows.append({
-                "file": p.name,
-                "size_mb": round(stat.st_size / 1024 / 1024, 2),
-                "modified_utc": datetime.utcfromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S"),
+                "file": a["file"],
+                "kind": a["kind"],
+                "size_mb": round((BACKUPS / a["file"]).stat().st_size / 1024 / 1024, 2),
+                "taken_utc": a["taken_utc"].strftime("%Y-%m-%d %H:%M:%S"),
             })
         except Exception:
             pass
     try:
         import pandas as pd
         st.dataframe(pd.DataFrame(rows), use_container_width=True, height=240)
-        latest = files[0]
-        with open(latest, "rb") as f:
-            st.download_button("⬇️ Download latest", data=f.read(),
-                               file_name=latest.name, mime="application/gzip")
+        # A .delta.gz only holds changed pages; it is useless without its
+        # base image, so downloads are full images only
+        fulls = [a for a in items if a["kind"] == "full"]
+        if fulls:
+            latest = BACKUPS / fulls[0]["file"]
+            with open(latest, "rb") as f:
+                st.download_button("⬇️ Download latest full image", data=f.read(),
+                                   file_name=latest.name, mime="application/gzip")
+        newest = items[0]
+        if newest["kind"] == "delta":
+            st.caption(f"Newest backup {newest['file']} is a delta; build a full image from its chain to download it.")
+            if st.button("Build image from latest delta chain"):
+                import gzip, shutil, tempfile
+                with tempfile.TemporaryDirectory(dir=BACKUPS) as tmp:
+                    db = ads_backup.restore(newest["file"], os.path.join(tmp, "vega_ads.db"), str(BACKUPS))
+                    gz = db + ".gz"
+                    with open(db, "rb") as fi, gzip.open(gz, "wb", compresslevel=6) as fo:
+                        shutil.copyfileobj(fi, fo)
+                    with open(gz, "rb") as f:
+                        st.download_button("⬇️ Download restored image", data=f.read(),
+                                           file_name=newest["file"].replace(".delta.gz", ".restored.db.gz"),
+                                           mime="application/gzip")
     except Exception as e:
         st.error(f"Display error: {e}")
 
 st.markdown("---")
 st.subheader("How to complete restore")
 st.markdown("""
-1. Restore to staging.  
-2. Validate.  
-3. Create a live backup.  
-4. Replace live files.  
+1. Pick the backup to restore. A **full** image (`*.db.gz`) stands alone.
+   A **delta** (`*.delta.gz`) needs its base full image and every delta
+   between them, all kept in the same backups folder.
+2. Restore to staging:
+   `python -c "from services.ads_backup import restore; restore('<file>', '/tmp/vega_ads.db')"`
+   (this gunzips the base image and applies the delta chain in order;
+   for a full image, plain `gunzip` works too).
+3. Validate: `sqlite3 /tmp/vega_ads.db 'PRAGMA integrity_check'`.
+4. Create a live backup.
+5. Stop ingestion, then replace `vega_ads.db` (and remove any `-wal`/`-shm` next to it).
 """)
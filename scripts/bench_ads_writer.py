@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Benchmark the vega_ads.db bulk writer (v2 layout) against the old
+row-at-a-time upsert into the pre-v2 TEXT/REAL table.
+
+    python scripts/bench_ads_writer.py [rows] [batch]
+
+Writes into a throwaway database under the temp dir, never VEGA_DATA_DIR.
+Rows are built before timing so only the write path is measured.
+"""
+import os, sys, time, sqlite3, tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from services import ads_db
+
+DDL = '''CREATE TABLE metrics(
+    adType TEXT, date TEXT, campaignId TEXT, campaignName TEXT,
+    impressions REAL, clicks REAL, cost REAL, purchases14d REAL, sales14d REAL,
+    profileId TEXT, createdAt TEXT DEFAULT (datetime('now')), rowHash INTEGER
+)'''
+IDX = 'CREATE UNIQUE INDEX ux_metrics ON metrics(adType,date,campaignId,profileId)'
+PROFILE = '3541234567890123'
+
+def make_rows(n, campaigns=2000):
+    # One row per campaign per day, as the daily campaign report delivers them
+    start = date(2020, 1, 1)
+    for i in range(n):
+        c = i % campaigns
+        yield {
+            'adType': 'SP', 'date': str(start + timedelta(days=i // campaigns)),
+            'campaignId': str(284_000_000_000_000 + c), 'campaignName': f'SP - Auto - Brand Product Line {c:04d} - Exact',
+            'impressions': i % 5000, 'clicks': i % 50, 'cost': (i % 4000) / 100, 'purchases14d': i % 3,
+            'sales14d': (i % 9000) / 100,
+        }
+
+def fresh_db(path, v2):
+    if os.path.exists(path):
+        os.remove(path)
+    con = sqlite3.connect(path)
+    if v2:
+        ads_db.apply_pragmas(con)
+        ads_db.init_schema(con)
+    else:
+        con.execute(DDL); con.execute(IDX); con.commit()
+    return con
+
+def legacy(con, rows, batch):
+    # Previous upsert_metrics: one execute + r.get per field per row, default journal
+    cur = con.cursor()
+    for r in rows:
+        cur.execute("""INSERT OR REPLACE INTO metrics
+            (adType,date,campaignId,campaignName,impressions,clicks,cost,purchases14d,sales14d,profileId)
+            VALUES (?,?,?,?,?,?,?,?,?,?)""", (
+                r.get('adType'), str(r.get('date')), str(r.get('campaignId')), r.get('campaignName'),
+                r.get('impressions',0), r.get('clicks',0), r.get('cost',0),
+                r.get('purchases14d',0), r.get('sales14d',0), PROFILE
+            ))
+    con.commit()
+
+def bulk(con, rows, batch):
+    for i in range(0, len(rows), batch):
+        ads_db.bulk_write(con, ads_db.METRICS, rows[i:i + batch], PROFILE)
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    path = os.path.join(tempfile.gettempdir(), 'vega_ads_bench.db')
+    rows = list(make_rows(n))
+    for name, fn, v2 in (('legacy', legacy, False), ('bulk', bulk, True)):
+        con = fresh_db(path, v2)
+        t = time.perf_counter()
+        fn(con, rows, batch)
+        dt = time.perf_counter() - t
+        con.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        con.close()
+        mb = os.path.getsize(path) / 1e6
+        print(f"{name:>6}: {n:,} rows in {dt:.2f}s = {n / dt:,.0f} rows/s, {mb:.1f} MB")
+    for suffix in ('', '-wal', '-shm'):
+        try:
+            os.remove(path + suffix)
+        except OSError:
+            pass
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,5 @@
 #!/usr/bin/env python3
-import os, sys, ast, yaml
+import os, sys, ast, yaml, subprocess, tempfile
 
 EXCLUDE_DIRS = {'.git', '.github', '.venv', 'venv', '__pycache__'}
 
@@ -19,6 +19,36 @@ def yaml_files(root='tools'):
             out.append(os.path.join(root, f))
     return out
 
+# Importing the ads service must stay cheap and side-effect free: the API,
+# the Streamlit app and every cron job import it at startup.
+IMPORT_BUDGET_MS = float(os.getenv('CI_IMPORT_BUDGET_MS', '80'))
+_IMPORT_PROBE = (
+    "import sys, time; t = time.perf_counter(); import services.amazon_ads_service; "
+    "print((time.perf_counter() - t) * 1000, 'requests' in sys.modules)"
+)
+
+def import_budget_errors(runs=3):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        data = os.path.join(tmp, 'data')
+        env = {**os.environ, 'VEGA_DATA_DIR': data, 'PYTHONDONTWRITEBYTECODE': '1'}
+        best = None
+        for _ in range(runs):
+            p = subprocess.run([sys.executable, '-c', _IMPORT_PROBE], cwd=root, env=env,
+                               capture_output=True, text=True)
+            if p.returncode:
+                return [f"IMPORT: services.amazon_ads_service: {p.stderr.strip().splitlines()[-1:]}"]
+            ms, has_requests = p.stdout.split()
+            best = min(best or float(ms), float(ms))
+        errors = []
+        if best > IMPORT_BUDGET_MS:
+            errors.append(f"IMPORT BUDGET: services.amazon_ads_service took {best:.0f} ms (> {IMPORT_BUDGET_MS:.0f} ms)")
+        if has_requests == 'True':
+            errors.append("IMPORT BUDGET: services.amazon_ads_service imports requests at load")
+        if os.path.exists(data):
+            errors.append("IMPORT SIDE EFFECT: services.amazon_ads_service created VEGA_DATA_DIR at import")
+    return errors
+
 def main():
     errors = []
     # Syntax check
@@ -36,6 +66,7 @@ def main():
                 data = yaml.safe_load(fh) or {}
         except Exception as e:
             errors.append(f"YAML READ: {y}: {e}")
+    errors += import_budget_errors()
     if errors:
         print("\n".join(errors))
         sys.exit(1)
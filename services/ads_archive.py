@@ -0,0 +1,178 @@
+# services/ads_archive.py
+# Cold storage for ads history. Whole months older than ARCHIVE_AFTER_DAYS
+# are moved out of vega_ads.db into Parquet files partitioned hive-style by
+# month and adType:
+#   <ARCHIVE_DIR>/<kind>/month=YYYYMM/adType=SP/part-0.parquet
+# read() prunes partitions and columns for the requested range and merges
+# archived rows with what is still in SQLite, so callers see one table.
+# Rollup tables (metrics_campaign_week/_month, ...) are not archived; they
+# keep serving long trends straight from the db. Keep ARCHIVE_AFTER_DAYS
+# well past the ingestion lookback: re-ingesting an archived month
+# recomputes that month's rollups from the rows still in SQLite.
+import os
+import pandas as pd
+from services import ads_db
+from services.ads_maintenance import _batched
+from services.ads_query import KINDS
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as pads
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except Exception:
+    PYARROW_AVAILABLE = False
+
+# Days kept in SQLite; only months ending before today - this are archived
+ARCHIVE_AFTER_DAYS = int(os.getenv('VEGA_ADS_ARCHIVE_AFTER_DAYS', '400'))
+COMPRESSION = os.getenv('VEGA_ADS_ARCHIVE_COMPRESSION', 'zstd')
+
+def archive_dir():
+    from services.amazon_ads_service import DATA_DIR
+    return os.getenv('VEGA_ADS_ARCHIVE_DIR') or os.path.join(DATA_DIR, 'archive')
+
+def _require_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError('pyarrow is required for the ads archive (pip install pyarrow)')
+
+# ---- columns ----
+def _columns(spec):
+    """{output column: SQL expression}; also the archive files' column order."""
+    return {c.split(' AS ')[-1].split('.')[-1]: c for c in spec.select_cols}
+
+def _key(spec):
+    return ['profileId', 'adType', 'date', 'campaignId'] + [ads_db.TERM_NAMES.get(c, c) for c in spec.natural_key[2:]]
+
+def _schema(spec):
+    # Fixed per kind so every partition reads back with the same types;
+    # adType lives in the partition path, not in the files
+    fields = []
+    for name in _columns(spec):
+        if name == 'adType':
+            continue
+        typ = pa.int64() if name in spec.ints else pa.float64() if name in spec.reals else pa.string()
+        fields.append((name, typ))
+    return pa.schema(fields)
+
+_PARTITIONING = None
+def _partitioning():
+    global _PARTITIONING
+    if _PARTITIONING is None:
+        _PARTITIONING = pads.partitioning(pa.schema([('month', pa.int32()), ('adType', pa.string())]), flavor='hive')
+    return _PARTITIONING
+
+def _partition_path(kind, month, ad_type):
+    return os.path.join(archive_dir(), kind, f'month={month}', f'adType={ad_type}', 'part-0.parquet')
+
+# ---- write ----
+def _write_partition(spec, month, ad_type, df):
+    path = _partition_path(spec.view, month, ad_type)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        # Month archived before (e.g. re-ingested later): newer rows win
+        old = pq.read_table(path).to_pandas()
+        old['adType'] = ad_type
+        df = pd.concat([old, df], ignore_index=True).drop_duplicates(_key(spec), keep='last')
+    # Sorted by date so row-group statistics prune date filters inside a month
+    df = df.sort_values(['date', 'campaignId']).drop(columns=['adType'])
+    table = pa.Table.from_pandas(df, schema=_schema(spec), preserve_index=False)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    pq.write_table(table, tmp, compression=COMPRESSION)
+    os.replace(tmp, path)
+    return len(df)
+
+def archive(con, spec, cutoff_day, log=print):
+    """Move every whole month of `spec` ending before cutoff_day to Parquet.
+
+    A month is written (one file per adType) before its rows are deleted
+    from SQLite (in DELETE_BATCH-row transactions), so an interrupted run
+    at worst leaves rows in both places, which read() de-duplicates. Returns the number of rows moved.
+    """
+    _require_pyarrow()
+    last = ads_db.month_bounds(ads_db.month_of(cutoff_day))[0] - 1
+    first = con.execute(f'SELECT MIN(day) FROM {spec.table}').fetchone()[0]
+    cols = _columns(spec)
+    moved = 0
+    while first is not None and first <= last:
+        month = ads_db.month_of(first)
+        lo, hi = ads_db.month_bounds(month)
+        df = pd.read_sql_query(f"SELECT {', '.join(cols.values())} FROM {spec.from_sql} WHERE f.day BETWEEN ? AND ?",
+                               con, params=[lo, hi])
+        for ad_type, part in df.groupby('adType'):
+            _write_partition(spec, month, ad_type, part)
+        # Small rowid batches, as retention does, so ingestion isn't locked out for a whole month
+        _batched(con, f'DELETE FROM {spec.table} WHERE rowid IN '
+                      f'(SELECT rowid FROM {spec.table} WHERE day BETWEEN ? AND ? LIMIT ?)', (lo, hi))
+        moved += len(df)
+        log(f'[archive] {spec.view} {month}: {len(df)} rows')
+        first = con.execute(f'SELECT MIN(day) FROM {spec.table} WHERE day > ?', (hi,)).fetchone()[0]
+    return moved
+
+def archive_all(after_days=None, log=print):
+    """Archive every kind; returns {kind: rows moved}."""
+    from datetime import date
+    from services.amazon_ads_service import _db
+    cutoff = ads_db.to_day(date.today()) - (ARCHIVE_AFTER_DAYS if after_days is None else after_days)
+    con = _db()
+    try:
+        return {spec.view: archive(con, spec, cutoff, log) for spec in ads_db.SPECS}
+    finally:
+        con.close()
+
+# ---- read ----
+def _read_cold(spec, lo, hi, columns, ad_types, profile_id):
+    root = os.path.join(archive_dir(), spec.view)
+    if not os.path.isdir(root):
+        return None
+    _require_pyarrow()
+    dataset = pads.dataset(root, format='parquet', partitioning=_partitioning())
+    d_lo, d_hi = str(ads_db.from_day(lo)), str(ads_db.from_day(hi))
+    f = ((pads.field('month') >= ads_db.month_of(lo)) & (pads.field('month') <= ads_db.month_of(hi))
+         & (pads.field('date') >= d_lo) & (pads.field('date') <= d_hi))
+    if ad_types:
+        f &= pads.field('adType').isin([t.upper() for t in ad_types])
+    if profile_id is not None:
+        f &= pads.field('profileId') == str(profile_id)
+    return dataset.to_table(columns=columns, filter=f).to_pandas()
+
+def _read_hot(con, spec, lo, hi, columns, ad_types, profile_id):
+    cols = _columns(spec)
+    where, params = ['f.day BETWEEN ? AND ?'], [lo, hi]
+    if ad_types:
+        where.append(f"c.adType IN ({','.join('?' * len(ad_types))})")
+        params += [t.upper() for t in ad_types]
+    if profile_id is not None:
+        where.append('c.profileId=?')
+        params.append(int(profile_id) if str(profile_id) else 0)
+    return pd.read_sql_query(f"SELECT {', '.join(cols[c] for c in columns)} FROM {spec.from_sql} "
+                             f"WHERE {' AND '.join(where)} ORDER BY f.day", con, params=params)
+
+def read(kind, start_date, end_date, columns=None, ad_types=None, profile_id=None, con=None):
+    """`kind` rows for [start_date, end_date] from SQLite and the archive.
+
+    columns limits what is read from both (None = the view's stored columns).
+    Archive partitions outside the months/adTypes asked for are never
+    opened. A row present in both places is taken from SQLite.
+    """
+    spec = KINDS[kind]
+    lo, hi = ads_db.to_day(start_date), ads_db.to_day(end_date)
+    # Default: the legacy view's columns, in its order, that are stored
+    out = [c for c in spec.view_columns if c in _columns(spec)] if columns is None else list(columns)
+    key = _key(spec)
+    need = out + [k for k in key if k not in out]
+    own = con is None
+    if own:
+        from services.amazon_ads_service import _db
+        con = _db()
+    try:
+        hot = _read_hot(con, spec, lo, hi, need, ad_types, profile_id)
+    finally:
+        if own:
+            con.close()
+    cold = _read_cold(spec, lo, hi, need, ad_types, profile_id)
+    if cold is None or cold.empty:
+        return hot[out]
+    if hot.empty:
+        return cold.sort_values('date', kind='stable')[out].reset_index(drop=True)
+    both = pd.concat([cold, hot], ignore_index=True).drop_duplicates(key, keep='last')
+    return both.sort_values('date', kind='stable')[out].reset_index(drop=True)
@@ -0,0 +1,251 @@
+# services/ads_backup.py
+# Consistent backups of vega_ads.db while ingestion keeps writing. The
+# SQLite online backup API copies the live db into a snapshot file a few
+# pages per step, then the snapshot is streamed through gzip into a
+# timestamped artefact:
+#   backups/vega_ads-<UTC ts>.db.gz      full image
+#   backups/vega_ads-<UTC ts>.delta.gz   pages changed since the previous
+#                                        artefact (delta mode)
+# A delta chain is restored with restore(); old artefacts are pruned to
+# the last KEEP_FULL full images and the deltas that build on them.
+#
+# Disk: the snapshot is an uncompressed copy of the db (the backup API
+# only writes to a database file) and lives until the artefact is written,
+# so a run needs room for the db plus its artefact. backup() checks the
+# backup folder's free space against that up front and refuses to start
+# (ENOSPC) rather than fill the disk the live db sits on.
+import os, json, gzip, time, errno, shutil, struct, sqlite3, hashlib
+from datetime import datetime
+
+KEEP_FULL = int(os.getenv('VEGA_ADS_BACKUP_KEEP', '7'))
+# Delta mode writes a new full image after this many deltas
+FULL_EVERY = int(os.getenv('VEGA_ADS_BACKUP_FULL_EVERY', '7'))
+STEP_PAGES = int(os.getenv('VEGA_ADS_BACKUP_STEP_PAGES', '1024'))
+STEP_SLEEP = float(os.getenv('VEGA_ADS_BACKUP_STEP_SLEEP_MS', '5')) / 1000
+# A write from another connection restarts a stepped backup; after this
+# many restarts the copy is finished in one step instead (a WAL read
+# snapshot, so writers still are not blocked)
+MAX_RESTARTS = int(os.getenv('VEGA_ADS_BACKUP_MAX_RESTARTS', '3'))
+
+PREFIX = 'vega_ads-'
+_CHAIN = 'vega_ads.chain.json'   # head artefact, page size, chain length
+_PAGES = 'vega_ads.pages'        # 16-byte digest per page of the head image
+_REC = struct.Struct('>I')
+
+def _db_bytes(db_path):
+    return sum(os.path.getsize(p) for p in (db_path, f'{db_path}-wal') if os.path.exists(p))
+
+def check_space(db_path, folder):
+    """Raise OSError(ENOSPC) unless folder has room for a snapshot plus its artefact."""
+    # Snapshot <= db + wal; the gzip artefact is at most about that again
+    need = 2 * _db_bytes(db_path)
+    free = shutil.disk_usage(folder).free
+    if free < need:
+        raise OSError(errno.ENOSPC, f'backup needs ~{need >> 20} MiB free in {folder}, '
+                                    f'only {free >> 20} MiB left')
+    return free - need
+
+def backup_dir():
+    from services.amazon_ads_service import DATA_DIR
+    return os.getenv('VEGA_ADS_BACKUP_DIR') or os.path.join(DATA_DIR, 'backups')
+
+# ---- snapshot ----
+def snapshot(src_path, dst_path, log=print):
+    """Copy src_path to dst_path with the online backup API; returns restarts."""
+    state = {'left': None, 'restarts': 0}
+
+    def progress(status, remaining, total):
+        if state['left'] is not None and remaining > state['left']:
+            state['restarts'] += 1
+            if state['restarts'] > MAX_RESTARTS:
+                raise _Restarted()
+        state['left'] = remaining
+
+    src = sqlite3.connect(src_path)
+    try:
+        for attempt in (STEP_PAGES, -1):
+            dst = sqlite3.connect(dst_path)
+            try:
+                src.backup(dst, pages=attempt, progress=progress, sleep=STEP_SLEEP)
+                return state['restarts']
+            except _Restarted:
+                log(f'[backup] source kept changing ({state["restarts"]} restarts); copying in one step')
+                state['left'] = None
+            finally:
+                dst.close()
+    finally:
+        src.close()
+
+class _Restarted(Exception):
+    pass
+
+def _pages(path, page_size):
+    with open(path, 'rb') as f:
+        while True:
+            page = f.read(page_size)
+            if not page:
+                return
+            yield page
+
+def _digest(page):
+    return hashlib.blake2b(page, digest_size=16).digest()
+
+# ---- artefacts ----
+def _stamp(folder, name):
+    # Time from the vega_ads-<UTC ts>. name; anything else (the old
+    # fixed-name vega_ads-backup.db.gz) goes by its mtime
+    try:
+        return datetime.strptime(name[len(PREFIX):].split('.', 1)[0], '%Y%m%dT%H%M%SZ')
+    except ValueError:
+        return datetime.utcfromtimestamp(os.path.getmtime(os.path.join(folder, name)))
+
+def _artefacts(folder):
+    names = [n for n in os.listdir(folder) if n.startswith(PREFIX) and n.endswith(('.db.gz', '.delta.gz'))]
+    return sorted(names, key=lambda n: (_stamp(folder, n), n))
+
+def artefacts(folder=None):
+    """Backup artefacts, oldest first, as [{'file', 'kind', 'taken_utc'}]."""
+    folder = folder or backup_dir()
+    return [{'file': n, 'kind': 'delta' if n.endswith('.delta.gz') else 'full', 'taken_utc': _stamp(folder, n)}
+            for n in _artefacts(folder)]
+
+def _write_atomic(path, write):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    write(tmp)
+    os.replace(tmp, path)
+
+def _read_chain(folder):
+    try:
+        with open(os.path.join(folder, _CHAIN), encoding='utf-8') as f:
+            chain = json.load(f)
+        with open(os.path.join(folder, _PAGES), 'rb') as f:
+            blob = f.read()
+    except (OSError, ValueError):
+        return None, None
+    if not os.path.exists(os.path.join(folder, chain.get('head', ''))):
+        return None, None
+    return chain, [blob[i:i + 16] for i in range(0, len(blob), 16)]
+
+def _save_chain(folder, chain, digests):
+    def pages(tmp):
+        with open(tmp, 'wb') as f:
+            f.write(b''.join(digests))
+    def meta(tmp):
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(chain, f)
+    _write_atomic(os.path.join(folder, _PAGES), pages)
+    _write_atomic(os.path.join(folder, _CHAIN), meta)
+
+def backup(db_path=None, folder=None, delta=False, log=print):
+    """Back up the live db; returns {'file', 'kind', 'pages', 'bytes', ...}.
+
+    delta=True writes only the pages that differ from the previous
+    artefact's image (a full image when there is no usable chain yet, or
+    every FULL_EVERY deltas).
+    """
+    if db_path is None:
+        from services.amazon_ads_service import DB_PATH as db_path
+    folder = folder or backup_dir()
+    os.makedirs(folder, exist_ok=True)
+    ts = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    while any(n.startswith(f'{PREFIX}{ts}.') for n in os.listdir(folder)):
+        # One artefact per second keeps names unique and in time order
+        time.sleep(0.2)
+        ts = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+    check_space(db_path, folder)
+    snap = os.path.join(folder, f'.snapshot-{os.getpid()}.db')
+    t0 = time.perf_counter()
+    try:
+        restarts = snapshot(db_path, snap, log)
+        con = sqlite3.connect(snap)
+        page_size = con.execute('PRAGMA page_size').fetchone()[0]
+        # The snapshot is a rollback-journal copy; no -wal to carry along
+        con.execute('PRAGMA journal_mode=DELETE')
+        con.close()
+        chain, prev = _read_chain(folder) if delta else (None, None)
+        if chain and (chain['page_size'] != page_size or chain['length'] >= FULL_EVERY):
+            chain = None
+        digests, written = [], 0
+        if chain is None:
+            name = f'{PREFIX}{ts}.db.gz'
+            def write(tmp):
+                with gzip.open(tmp, 'wb', compresslevel=6) as out:
+                    for page in _pages(snap, page_size):
+                        digests.append(_digest(page))
+                        out.write(page)
+            _write_atomic(os.path.join(folder, name), write)
+            written = len(digests)
+            chain = {'full': name, 'length': 0}
+        else:
+            name = f'{PREFIX}{ts}.delta.gz'
+            def write(tmp):
+                nonlocal written
+                with gzip.open(tmp, 'wb', compresslevel=6) as out:
+                    out.write(json.dumps({'base': chain['head'], 'page_size': page_size,
+                                          'page_count': os.path.getsize(snap) // page_size}).encode() + b'\n')
+                    for no, page in enumerate(_pages(snap, page_size)):
+                        d = _digest(page)
+                        digests.append(d)
+                        if no >= len(prev) or prev[no] != d:
+                            out.write(_REC.pack(no))
+                            out.write(page)
+                            written += 1
+            _write_atomic(os.path.join(folder, name), write)
+            chain = {'full': chain['full'], 'length': chain['length'] + 1}
+        chain.update(head=name, page_size=page_size)
+        _save_chain(folder, chain, digests)
+    finally:
+        for p in (snap, f'{snap}-journal', f'{snap}-wal', f'{snap}-shm'):
+            if os.path.exists(p):
+                os.remove(p)
+    pruned = prune(folder)
+    out = {'file': name, 'kind': 'delta' if name.endswith('.delta.gz') else 'full', 'pages': written,
+           'db_pages': len(digests), 'bytes': os.path.getsize(os.path.join(folder, name)),
+           'restarts': restarts, 'pruned': pruned, 'seconds': round(time.perf_counter() - t0, 2)}
+    log(f"[backup] {out['file']}: {out['pages']}/{out['db_pages']} pages, {out['bytes']} bytes")
+    return out
+
+def prune(folder=None, keep=None):
+    """Keep the newest `keep` full images and the deltas after the oldest of them."""
+    folder = folder or backup_dir()
+    keep = KEEP_FULL if keep is None else keep
+    names = _artefacts(folder)   # in time order
+    fulls = [n for n in names if n.endswith('.db.gz')]
+    if len(fulls) <= keep:
+        return []
+    drop = names[:names.index(fulls[-keep])] if keep else names
+    for n in drop:
+        os.remove(os.path.join(folder, n))
+    return drop
+
+def restore(artefact, target, folder=None):
+    """Rebuild the db image `artefact` names (a full or a delta) into target."""
+    folder = folder or backup_dir()
+    chain = []
+    name = artefact
+    while name.endswith('.delta.gz'):
+        with gzip.open(os.path.join(folder, name), 'rb') as f:
+            head = json.loads(f.readline())
+        chain.append((name, head))
+        name = head['base']
+    tmp = f'{target}.{os.getpid()}.tmp'
+    with gzip.open(os.path.join(folder, name), 'rb') as src, open(tmp, 'wb') as out:
+        while True:
+            buf = src.read(1 << 20)
+            if not buf:
+                break
+            out.write(buf)
+    with open(tmp, 'r+b') as out:
+        for name, head in reversed(chain):
+            size = head['page_size']
+            with gzip.open(os.path.join(folder, name), 'rb') as f:
+                f.readline()
+                while True:
+                    rec = f.read(_REC.size)
+                    if not rec:
+                        break
+                    out.seek(_REC.unpack(rec)[0] * size)
+                    out.write(f.read(size))
+            out.truncate(head['page_count'] * size)
+    os.replace(tmp, target)
+    return target
@@ -0,0 +1,584 @@
+# services/ads_db.py
+# SQLite storage for vega_ads.db: pooled connections and pragmas, the v2
+# schema and batched bulk writes.
+import os, sqlite3, threading
+from contextlib import contextmanager
+from datetime import date
+from hashlib import blake2b
+from operator import itemgetter
+
+# WAL lets the Streamlit/API readers keep reading while ingestion writes;
+# NORMAL sync is durable across app crashes under WAL (only an OS crash can
+# lose the last commits) and avoids an fsync per transaction.
+PRAGMAS = (
+    # Only takes effect on a new file (ads_maintenance converts old ones
+    # once); lets maintenance hand free pages back in small steps
+    'PRAGMA auto_vacuum=INCREMENTAL',
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-32000',   # ~32 MB page cache
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+def apply_pragmas(con):
+    for p in PRAGMAS:
+        con.execute(p)
+    return con
+
+# ---------- connection pool ----------
+# One long-lived connection per (thread, db path): pragmas run once and
+# the per-connection statement cache keeps hot queries prepared, so a
+# small API read costs a cache lookup instead of open + 5 pragmas.
+STATEMENT_CACHE = int(os.getenv('VEGA_ADS_STATEMENT_CACHE', '256'))
+
+class PooledConnection(sqlite3.Connection):
+    """Connection handed out by connect(). close() only rolls back an
+    uncommitted transaction (what a real close would discard) and keeps
+    the connection for the thread's next connect()."""
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def really_close(self):
+        super().close()
+
+_pool = threading.local()
+
+def connect(path):
+    cons = _pool.__dict__.setdefault('cons', {})
+    con = cons.get(path)
+    # A forked child must not reuse the parent's handle
+    if con is None or con.pid != os.getpid():
+        con = sqlite3.connect(path, factory=PooledConnection, check_same_thread=False,
+                              cached_statements=STATEMENT_CACHE)
+        con.pid = os.getpid()
+        apply_pragmas(con)
+        cons[path] = con
+    con.row_factory = sqlite3.Row
+    return con
+
+def release(path):
+    """Really close this thread's pooled connection to `path`, if any."""
+    con = _pool.__dict__.get('cons', {}).pop(path, None)
+    if con is not None:
+        con.really_close()
+
+def ensure_columns(con, table, columns):
+    """ALTER TABLE ADD COLUMN for any of {name: type} the table lacks."""
+    have = {r[1] for r in con.execute(f'PRAGMA table_info({table})')}
+    for name, typ in columns.items():
+        if name not in have:
+            con.execute(f'ALTER TABLE {table} ADD COLUMN {name} {typ}')
+
+@contextmanager
+def transaction(con):
+    """Short explicit write transaction; takes the write lock up front."""
+    con.execute('BEGIN IMMEDIATE')
+    try:
+        yield con
+    except BaseException:
+        con.rollback()
+        raise
+    con.commit()
+
+# ---------- v2 schema ----------
+# Facts are keyed by integer surrogates: campaignKey -> ads_campaign (one
+# row per profile/adType/campaign, holding the name) and termKey ->
+# ads_term (search terms, keyword texts and placements, each stored once).
+# `day` is days since 1970-01-01 and counters are INTEGER, so a daily row
+# is a handful of small varints. The old table names survive as views.
+EPOCH = date(1970, 1, 1).toordinal()
+
+DIMENSIONS = (
+    '''CREATE TABLE IF NOT EXISTS ads_campaign(
+        campaignKey INTEGER PRIMARY KEY,
+        profileId INTEGER NOT NULL, adType TEXT NOT NULL, campaignId INTEGER NOT NULL,
+        campaignName TEXT,
+        UNIQUE(profileId, adType, campaignId)
+    )''',
+    '''CREATE TABLE IF NOT EXISTS ads_term(
+        termKey INTEGER PRIMARY KEY,
+        term TEXT NOT NULL UNIQUE
+    )''',
+)
+
+def to_day(v):
+    """'YYYY-MM-DD' (or a date) -> days since 1970-01-01."""
+    if isinstance(v, date):
+        return v.toordinal() - EPOCH
+    return date.fromisoformat(str(v)[:10]).toordinal() - EPOCH
+
+def from_day(n):
+    return date.fromordinal(int(n) + EPOCH)
+
+def _num(v):
+    # Ads ids are numeric; anything else is kept as text rather than mangled
+    try:
+        return int(v)
+    except (TypeError, ValueError):
+        return str(v) if v is not None else ''
+
+def _int(v):
+    try:
+        return int(round(float(v or 0)))
+    except (TypeError, ValueError):
+        return 0
+
+def _real(v):
+    try:
+        return float(v or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+class TableSpec:
+    """Maps report rows onto one v2 fact table and its legacy view.
+
+    Every fact row is (campaignKey, day, *ids, *term keys, *ints, *reals,
+    rowHash). `ids` are (column, fn(row), in_key) integer Ads ids stored
+    as-is; `terms` are the same for dictionary-encoded text fields. Those
+    with in_key join (campaignKey, day) in the natural key the upsert
+    conflicts on. Every other column feeds rowHash, and a conflicting row
+    whose hash is unchanged is not rewritten.
+
+    `view_cols` fixes the legacy view's columns and their order (those of
+    the pre-v2 table; columns v2 does not store read as NULL). The v2
+    internals (day, campaignKey, rowHash) are never exposed through it.
+    """
+    def __init__(self, view, ints, reals, terms=(), ids=(), view_cols=None):
+        self.view = view
+        self.view_cols = view_cols
+        self.table = f'{view}_v2'
+        self.terms = tuple(sorted(terms, key=lambda t: not t[2]))  # key terms first
+        self.ids = tuple(sorted(ids, key=lambda t: not t[2]))
+        self.ints, self.reals = ints, reals
+        # (column, fn, is_term) in storage order: key fields, then the rest
+        self.fields = tuple((c, fn, term) for key in (True, False)
+                            for fields, term in ((self.ids, False), (self.terms, True))
+                            for c, fn, k in fields if k == key)
+        self.natural_key = ('campaignKey', 'day') + tuple(c for c, _, k in self.ids + self.terms if k)
+        self.columns = ('campaignKey', 'day') + tuple(c for c, _, _ in self.fields) + ints + reals + ('rowHash',)
+        self.hashed = slice(len(self.natural_key), None)
+        marks = ','.join('?' * len(self.columns))
+        self.insert_sql = f"INSERT INTO {self.table} ({','.join(self.columns)}) VALUES ({marks})"
+        updates = ','.join(f'{c}=excluded.{c}' for c in self.columns if c not in self.natural_key)
+        self.sql = (f"{self.insert_sql} ON CONFLICT({','.join(self.natural_key)}) DO UPDATE SET {updates} "
+                    f"WHERE {self.table}.rowHash IS NOT excluded.rowHash")
+
+    @property
+    def ddl(self):
+        cols = ['campaignKey INTEGER NOT NULL', 'day INTEGER NOT NULL']
+        cols += [f'{c} INTEGER NOT NULL' for c, _, _ in self.fields]
+        cols += [f'{c} INTEGER' for c in self.ints] + [f'{c} REAL' for c in self.reals]
+        cols += ['rowHash INTEGER', f"UNIQUE({','.join(self.natural_key)})"]
+        return f"CREATE TABLE IF NOT EXISTS {self.table}(\n    " + ',\n    '.join(cols) + '\n)'
+
+    @property
+    def measures(self):
+        return self.ints + self.reals
+
+    @property
+    def select_cols(self):
+        # Same columns (and text types) as the pre-v2 tables
+        return ['c.adType', "date(f.day * 86400, 'unixepoch') AS date",
+                'CAST(c.campaignId AS TEXT) AS campaignId', 'c.campaignName',
+                *(f'CAST(f.{c} AS TEXT) AS {c}' for c, _, _ in self.ids),
+                *(f't{i}.term AS {TERM_NAMES[c]}' for i, (c, _, _) in enumerate(self.terms)),
+                *(f'f.{c}' for c in self.measures), f'{PROFILE_TEXT} AS profileId']
+
+    @property
+    def from_sql(self):
+        joins = ''.join(f' JOIN ads_term t{i} ON t{i}.termKey = f.{c}' for i, (c, _, _) in enumerate(self.terms))
+        return f'{self.table} f JOIN ads_campaign c ON c.campaignKey = f.campaignKey{joins}'
+
+    @property
+    def view_columns(self):
+        return self.view_cols or tuple(c.split(' AS ')[-1].split('.')[-1] for c in self.select_cols)
+
+    @property
+    def view_ddl(self):
+        exprs = {c.split(' AS ')[-1].split('.')[-1]: c for c in self.select_cols}
+        cols = ', '.join(exprs.get(n, f'NULL AS {n}') for n in self.view_columns)
+        return f'CREATE VIEW IF NOT EXISTS {self.view} AS SELECT {cols} FROM {self.from_sql}'
+
+    def tuples(self, rows, campaign_keys, term_keys):
+        # campaign_keys: {(adType, campaignId as in the row): campaignKey}
+        fields = [(fn, term) for _, fn, term in self.fields]
+        ints, reals, hashed, ni = self.ints, self.reals, self.hashed, len(self.ints)
+        get = itemgetter(*ints, *reals)
+        days = {}
+        for r in rows:
+            d = r.get('date')
+            day = days.get(d)
+            if day is None:
+                day = days[d] = to_day(d)
+            head = (campaign_keys[(r.get('adType'), r.get('campaignId'))], day,
+                    *[term_keys[fn(r)] if term else fn(r) for fn, term in fields])
+            # Fast path: counters present and already numeric
+            try:
+                v = get(r)
+                t = head + tuple(map(int, v[:ni])) + tuple(map(float, v[ni:]))
+            except (KeyError, TypeError, ValueError):
+                t = head + tuple(_int(r.get(c)) for c in ints) + tuple(_real(r.get(c)) for c in reals)
+            yield t + (row_hash(t[hashed]),)
+
+def _text(*names):
+    def get(r):
+        for n in names:
+            v = r.get(n)
+            if v:
+                return str(v)
+        return ''
+    return get
+
+def _id(*names):
+    # Ads ids are numeric; a missing one is stored as 0
+    def get(r):
+        for n in names:
+            v = r.get(n)
+            if v:
+                try:
+                    return int(v)
+                except (TypeError, ValueError):
+                    continue
+        return 0
+    return get
+
+PROFILE_TEXT = "CASE c.profileId WHEN 0 THEN '' ELSE CAST(c.profileId AS TEXT) END"
+TERM_NAMES = {'termKey': 'searchTerm', 'keywordKey': 'keywordText', 'placementKey': 'placement',
+              'matchTypeKey': 'matchType'}
+
+METRICS = TableSpec('metrics',
+    ints=('impressions', 'clicks', 'purchases14d'), reals=('cost', 'sales14d'),
+    view_cols=('adType', 'date', 'campaignId', 'campaignName', 'impressions', 'clicks', 'cost',
+               'purchases14d', 'sales14d', 'profileId', 'createdAt'))
+SEARCH_TERMS = TableSpec('search_terms',
+    ints=('impressions', 'clicks'), reals=('cost', 'sales14d'),
+    terms=(('termKey', _text('searchTerm'), True), ('keywordKey', _text('keywordText', 'keyword'), False)),
+    view_cols=('adType', 'date', 'campaignId', 'keywordText', 'searchTerm', 'impressions', 'clicks', 'cost',
+               'sales14d', 'profileId', 'createdAt'))
+PLACEMENTS = TableSpec('placements',
+    ints=('impressions', 'clicks'), reals=('cost', 'sales14d'),
+    terms=(('placementKey', _text('placement'), True),),
+    view_cols=('adType', 'date', 'campaignId', 'placement', 'impressions', 'clicks', 'cost',
+               'sales14d', 'profileId', 'createdAt'))
+# Keyword (SP/SB) and targeting (SD, product/audience targets) rows share
+# one table: the target's id is keywordId, its text keywordText
+KEYWORDS = TableSpec('keywords',
+    ints=('impressions', 'clicks', 'purchases14d'), reals=('cost', 'sales14d'),
+    ids=(('keywordId', _id('keywordId', 'targetId', 'targetingId'), True), ('adGroupId', _id('adGroupId'), False)),
+    terms=(('keywordKey', _text('keyword', 'keywordText', 'targeting', 'targetingText', 'targetingExpression'), False),
+           ('matchTypeKey', _text('matchType', 'keywordType'), False)),
+    view_cols=('adType', 'date', 'campaignId', 'campaignName', 'keywordId', 'adGroupId', 'keywordText', 'matchType',
+               'impressions', 'clicks', 'cost', 'purchases14d', 'sales14d', 'profileId'))
+SPECS = (METRICS, SEARCH_TERMS, PLACEMENTS, KEYWORDS)
+
+def row_hash(values):
+    """Stable signed 64-bit digest of a row's non-key values."""
+    return int.from_bytes(blake2b(repr(values).encode(), digest_size=8).digest(), 'big', signed=True)
+
+def _object_type(con, name):
+    row = con.execute('SELECT type FROM sqlite_master WHERE name=?', (name,)).fetchone()
+    return row[0] if row else None
+
+def init_schema(con):
+    """Create dimensions, v2 fact tables, day indexes and the legacy views.
+
+    Returns the legacy tables still waiting for migrate_v2(); their views
+    are created once they have been migrated.
+    """
+    for ddl in DIMENSIONS:
+        con.execute(ddl)
+    pending = []
+    for spec in SPECS:
+        con.execute(spec.ddl)
+        # Date-range scans in (day, natural key) order: exports, rollups and
+        # the API's keyset pages seek straight to the page start
+        con.execute(f'DROP INDEX IF EXISTS ix_{spec.table}_day')
+        con.execute(f"CREATE INDEX IF NOT EXISTS ix_{spec.table}_day_key ON {spec.table}"
+                    f"(day, {','.join(spec.natural_key[:1] + spec.natural_key[2:])})")
+        if _object_type(con, spec.view) == 'table' or _object_type(con, f'{spec.view}_v1') == 'table':
+            pending.append(spec.view)
+        else:
+            # Views created by older versions carried the v2 internals and
+            # another column order; replace them
+            if _object_type(con, spec.view) == 'view' and [
+                    r[1] for r in con.execute(f'PRAGMA table_info({spec.view})')] != list(spec.view_columns):
+                con.execute(f'DROP VIEW {spec.view}')
+            con.execute(spec.view_ddl)
+    for name, (cols, key) in ROLLUPS.items():
+        con.execute(f'CREATE TABLE IF NOT EXISTS metrics_{name}({cols}, {_MEASURE_COLS}, '
+                    f'PRIMARY KEY({key})) WITHOUT ROWID')
+    con.execute('CREATE INDEX IF NOT EXISTS ix_metrics_campaign_month_month ON metrics_campaign_month(month)')
+    con.commit()
+    # Facts written before (some of) the rollups existed
+    if con.execute('SELECT 1 FROM metrics_v2 LIMIT 1').fetchone() and any(
+            not con.execute(f'SELECT 1 FROM metrics_{name} LIMIT 1').fetchone() for name in ROLLUPS):
+        rebuild_rollups(con)
+    return pending
+
+# ---------- Rollups ----------
+# Pre-aggregated metrics at the grains dashboards and exports read. They are
+# refreshed inside each ingestion batch's transaction, recomputing only the
+# buckets the batch touched (a campaign-week is <= 7 fact rows, a
+# campaign-month <= 31), so readers never see facts and rollups disagree.
+# week = day of that week's Monday; month = YYYYMM.
+MEASURES = ('impressions', 'clicks', 'cost', 'purchases14d', 'sales14d')
+_SUMS = ', '.join(f'SUM({m})' for m in MEASURES)
+_SUMS_F = ', '.join(f'SUM(f.{m})' for m in MEASURES)
+_MEASURE_COLS = ', '.join(f'{m} {"REAL" if m in ("cost", "sales14d") else "INTEGER"}' for m in MEASURES)
+
+ROLLUPS = {
+    'campaign_week':  ('campaignKey INTEGER, week INTEGER', 'campaignKey, week'),
+    'campaign_month': ('campaignKey INTEGER, month INTEGER', 'campaignKey, month'),
+    'adtype_day':     ('profileId INTEGER, day INTEGER, adType TEXT', 'profileId, day, adType'),
+    'account_day':    ('profileId INTEGER, day INTEGER', 'profileId, day'),
+    # Running totals per campaign up to and including `day`: any range total
+    # is cumsum(<= end) - cumsum(< start), two seeks whatever the window
+    'cumsum':         ('campaignKey INTEGER, day INTEGER', 'campaignKey, day'),
+}
+
+def week_of(day):
+    return day - (day + 3) % 7   # 1970-01-01 was a Thursday
+
+def month_of(day):
+    d = from_day(day)
+    return d.year * 100 + d.month
+
+def month_bounds(month):
+    y, m = divmod(month, 100)
+    nxt = date(y + (m == 12), m % 12 + 1, 1)
+    return to_day(date(y, m, 1)), to_day(nxt) - 1
+
+# A touched bucket is recomputed from the fact rows in SQLite with one
+# INSERT OR REPLACE; it never empties, since the batch that touched it just
+# wrote a row into it. Archive and retention delete facts too, but only
+# well behind the ingestion lookback, so buckets ingestion touches still
+# hold all their facts; rebuild_rollups leaves the older buckets alone.
+_REFRESH = {
+    'campaign_week': f"""INSERT OR REPLACE INTO metrics_campaign_week SELECT campaignKey, ?2, {_SUMS}
+        FROM metrics_v2 WHERE campaignKey=?1 AND day BETWEEN ?2 AND ?2 + 6 GROUP BY campaignKey""",
+    'campaign_month': f"""INSERT OR REPLACE INTO metrics_campaign_month SELECT campaignKey, ?2, {_SUMS}
+        FROM metrics_v2 WHERE campaignKey=?1 AND day BETWEEN ?3 AND ?4 GROUP BY campaignKey""",
+    'adtype_day': f"""INSERT OR REPLACE INTO metrics_adtype_day SELECT c.profileId, f.day, c.adType, {_SUMS_F}
+        FROM metrics_v2 f JOIN ads_campaign c ON c.campaignKey = f.campaignKey
+        WHERE c.profileId=?1 AND c.adType=?2 AND f.day=?3 GROUP BY c.profileId""",
+    'account_day': f"""INSERT OR REPLACE INTO metrics_account_day SELECT profileId, day, {_SUMS}
+        FROM metrics_adtype_day WHERE profileId=?1 AND day=?2 GROUP BY profileId""",
+    # Suffix from the campaign's earliest touched day, on top of the last
+    # running total before it
+    'cumsum': f"""INSERT OR REPLACE INTO metrics_cumsum
+        SELECT f.campaignKey, f.day, {', '.join(f'COALESCE(b.{m}, 0) + SUM(f.{m}) OVER w' for m in MEASURES)}
+        FROM metrics_v2 f LEFT JOIN (SELECT * FROM metrics_cumsum WHERE campaignKey=?1 AND day < ?2
+                                     ORDER BY day DESC LIMIT 1) b ON 1
+        WHERE f.campaignKey=?1 AND f.day >= ?2
+        WINDOW w AS (ORDER BY f.day)""",
+}
+
+def _refresh_rollups(con, touched):
+    """Recompute every rollup bucket containing a (campaignKey, day) in `touched`."""
+    if not touched:
+        return
+    ckeys = list({ck for ck, _ in touched})
+    owners = {}
+    for i in range(0, len(ckeys), 500):
+        part = ckeys[i:i + 500]
+        owners.update((k, (p, t)) for k, p, t in con.execute(
+            f"SELECT campaignKey, profileId, adType FROM ads_campaign WHERE campaignKey IN ({','.join('?' * len(part))})", part))
+    adtype_days = {(*owners[ck], d) for ck, d in touched}
+    con.executemany(_REFRESH['campaign_week'], {(ck, week_of(d)) for ck, d in touched})
+    con.executemany(_REFRESH['campaign_month'], [(ck, m, *month_bounds(m)) for ck, m in {(ck, month_of(d)) for ck, d in touched}])
+    con.executemany(_REFRESH['adtype_day'], adtype_days)
+    con.executemany(_REFRESH['account_day'], {(p, d) for p, _, d in adtype_days})
+    first = {}
+    for ck, d in touched:
+        if d < first.get(ck, d + 1):
+            first[ck] = d
+    con.executemany(_REFRESH['cumsum'], first.items())
+
+def rebuild_rollups(con, log=print):
+    """Recompute rollups from metrics_v2 in one transaction (backfill/repair).
+
+    Only buckets from the earliest day still in metrics_v2 on are rebuilt.
+    Earlier days were archived (ads_archive) or dropped by retention
+    (ads_maintenance) and their facts are gone, so their rollup rows, and
+    a bucket straddling that day, are kept as they are; missing ones are
+    filled from whatever facts remain. Cumulative totals continue from
+    each campaign's last running total before that day.
+    """
+    first = con.execute('SELECT MIN(day) FROM metrics_v2').fetchone()[0]
+    if first is None:
+        log('[rollups] no facts; rollups left as they are')
+        return
+    # First month that starts on or after `first`
+    d = from_day(first)
+    month = month_of(first) if d.day == 1 else month_of(month_bounds(month_of(first))[1] + 1)
+    with transaction(con):
+        for name, col, since in (('campaign_week', 'week', first), ('campaign_month', 'month', month),
+                                 ('adtype_day', 'day', first), ('account_day', 'day', first),
+                                 ('cumsum', 'day', first)):
+            con.execute(f'DELETE FROM metrics_{name} WHERE {col} >= ?', (since,))
+        con.execute(f'''INSERT OR IGNORE INTO metrics_campaign_week SELECT campaignKey, day - (day + 3) % 7 AS week, {_SUMS}
+                        FROM metrics_v2 GROUP BY campaignKey, week''')
+        con.execute(f'''INSERT OR IGNORE INTO metrics_campaign_month
+                        SELECT campaignKey, CAST(strftime('%Y%m', day * 86400, 'unixepoch') AS INTEGER) AS month, {_SUMS}
+                        FROM metrics_v2 GROUP BY campaignKey, month''')
+        con.execute(f'''INSERT OR IGNORE INTO metrics_adtype_day SELECT c.profileId, f.day, c.adType, {_SUMS_F}
+                        FROM metrics_v2 f JOIN ads_campaign c ON c.campaignKey = f.campaignKey
+                        GROUP BY c.profileId, c.adType, f.day''')
+        con.execute(f'''INSERT OR IGNORE INTO metrics_account_day SELECT profileId, day, {_SUMS}
+                        FROM metrics_adtype_day WHERE day >= ? GROUP BY profileId, day''', (first,))
+        running = ', '.join(f'COALESCE(b.{m}, 0) + SUM(f.{m}) OVER (PARTITION BY f.campaignKey ORDER BY f.day)'
+                            for m in MEASURES)
+        con.execute(f'''INSERT INTO metrics_cumsum SELECT f.campaignKey, f.day, {running}
+                        FROM metrics_v2 f LEFT JOIN (SELECT * FROM metrics_cumsum x WHERE day =
+                            (SELECT MAX(day) FROM metrics_cumsum WHERE campaignKey = x.campaignKey)) b
+                          ON b.campaignKey = f.campaignKey''')
+    log(f"[rollups] rebuilt {', '.join(ROLLUPS)} from {from_day(first)}")
+
+# ---------- Dimension lookups ----------
+# Surrogate keys never change once assigned, so they are cached per
+# database file; a rolled-back batch drops the cache (its keys may not exist).
+_dim_cache = {}
+
+def _dims(con):
+    path = con.execute('PRAGMA database_list').fetchone()[2]
+    return _dim_cache.setdefault(path, ({}, {}))
+
+def _campaign_keys(con, campaigns, profile_id, rows):
+    """{(adType, campaignId) as the rows carry them: campaignKey}; upserts names."""
+    pid = _num(profile_id) if profile_id else 0
+    wanted = {}
+    for r in rows:
+        wanted[(r.get('adType'), r.get('campaignId'))] = r.get('campaignName')
+    out, stale = {}, []
+    for (t, raw), name in wanted.items():
+        k = (pid, t, _num(raw))
+        hit = campaigns.get(k)
+        if hit is None or (name is not None and hit[1] != name):
+            stale.append((k, raw, name))
+        else:
+            out[(t, raw)] = hit[0]
+    if stale:
+        con.executemany("""INSERT INTO ads_campaign(profileId, adType, campaignId, campaignName) VALUES (?,?,?,?)
+            ON CONFLICT(profileId, adType, campaignId) DO UPDATE SET campaignName=excluded.campaignName
+            WHERE excluded.campaignName IS NOT NULL AND campaignName IS NOT excluded.campaignName""",
+            [k + (name,) for k, _, name in stale])
+        for k, raw, name in stale:
+            campaigns[k] = con.execute('SELECT campaignKey, campaignName FROM ads_campaign '
+                                       'WHERE profileId=? AND adType=? AND campaignId=?', k).fetchone()
+            out[(k[1], raw)] = campaigns[k][0]
+    return out
+
+def _term_keys(con, terms, spec, rows):
+    missing = {fn(r) for _, fn, _ in spec.terms for r in rows} - terms.keys()
+    if missing:
+        missing = list(missing)
+        con.executemany('INSERT OR IGNORE INTO ads_term(term) VALUES (?)', [(t,) for t in missing])
+        for i in range(0, len(missing), 500):
+            part = missing[i:i + 500]
+            terms.update(con.execute(f"SELECT term, termKey FROM ads_term WHERE term IN ({','.join('?' * len(part))})", part))
+    return terms
+
+def _write(con, spec, rows, profile_id):
+    """Upsert one batch inside the caller's transaction; returns counts."""
+    campaigns, terms = _dims(con)
+    keys = _campaign_keys(con, campaigns, profile_id, rows)
+    if spec.terms:
+        _term_keys(con, terms, spec, rows)
+    n = len(rows)
+    top = con.execute(f'SELECT MAX(rowid) FROM {spec.table}').fetchone()[0] or 0
+    if spec is METRICS:
+        _track_touched(con)
+    before = con.total_changes
+    con.executemany(spec.sql, spec.tuples(rows, keys, terms))
+    changed = con.total_changes - before
+    inserted = (con.execute(f'SELECT MAX(rowid) FROM {spec.table}').fetchone()[0] or 0) - top
+    if spec is METRICS:
+        # One temp._touched row per fact row written; total_changes counts
+        # those trigger inserts too
+        touched = con.execute('SELECT campaignKey, day FROM temp._touched').fetchall()
+        changed = len(touched)
+        _refresh_rollups(con, set(map(tuple, touched)))
+    return {'rows': n, 'inserted': inserted, 'updated': changed - inserted, 'unchanged': n - changed}
+
+# Rollups are refreshed only for the (campaignKey, day) of fact rows that
+# were really inserted or updated; the upsert's WHERE skips unchanged ones,
+# so the triggers never fire for them. Temp objects: per connection, and
+# never written to the db file.
+_TOUCH_DDL = (
+    'CREATE TEMP TABLE IF NOT EXISTS _touched(campaignKey INTEGER, day INTEGER)',
+    *(f'''CREATE TEMP TRIGGER IF NOT EXISTS _touched_{op.lower()} AFTER {op} ON main.metrics_v2
+          BEGIN INSERT INTO _touched VALUES (NEW.campaignKey, NEW.day); END''' for op in ('INSERT', 'UPDATE')),
+)
+
+def _track_touched(con):
+    for ddl in _TOUCH_DDL:
+        con.execute(ddl)
+    con.execute('DELETE FROM temp._touched')
+
+def bulk_write(con, spec, rows, profile_id=''):
+    """Upsert one batch of report rows inside a single transaction.
+
+    Returns {'rows', 'inserted', 'updated', 'unchanged'}. New rows get
+    rowid MAX+1 while upserted rows keep theirs, so the MAX(rowid) delta
+    splits total_changes into inserts and updates without extra lookups.
+    """
+    try:
+        with transaction(con):
+            return _write(con, spec, rows, profile_id)
+    except BaseException:
+        _dim_cache.clear()
+        raise
+
+# ---------- v1 -> v2 migration ----------
+def migrate_v2(con, chunk=50000, log=print):
+    """Move pre-v2 tables (TEXT dates/ids, REAL counters) into the v2 layout.
+
+    Each legacy table is renamed to <name>_v1, copied in rowid chunks
+    through the normal writer (one short transaction per chunk, later rows
+    win on duplicate keys), then dropped and replaced by its view. Progress
+    is kept in migrate_state, so an interrupted run resumes where it stopped.
+    Returns the number of legacy rows copied.
+    """
+    con.execute('CREATE TABLE IF NOT EXISTS migrate_state(tbl TEXT PRIMARY KEY, lastRowid INTEGER)')
+    con.commit()
+    total = 0
+    for spec in SPECS:
+        old = f'{spec.view}_v1'
+        with transaction(con):
+            if _object_type(con, spec.view) == 'table':
+                con.execute(f'ALTER TABLE {spec.view} RENAME TO {old}')
+        if _object_type(con, old) != 'table':
+            continue
+        top = con.execute(f'SELECT MAX(rowid) FROM {old}').fetchone()[0] or 0
+        copied = 0
+        while True:
+            try:
+                with transaction(con):
+                    row = con.execute('SELECT lastRowid FROM migrate_state WHERE tbl=?', (old,)).fetchone()
+                    last = row[0] if row else 0
+                    if last >= top:
+                        break
+                    cur = con.execute(f'SELECT rowid, * FROM {old} WHERE rowid > ? ORDER BY rowid LIMIT ?', (last, chunk))
+                    names = [d[0] for d in cur.description]
+                    rows = [dict(zip(names, r)) for r in cur]
+                    by_profile = {}
+                    for r in rows:
+                        by_profile.setdefault(r.get('profileId') or '', []).append(r)
+                    for pid, part in by_profile.items():
+                        _write(con, spec, part, pid)
+                    last = rows[-1]['rowid'] if rows else top
+                    con.execute('INSERT OR REPLACE INTO migrate_state(tbl, lastRowid) VALUES (?,?)', (old, last))
+            except BaseException:
+                _dim_cache.clear()
+                raise
+            copied += len(rows)
+            log(f"[migrate] {old}: rowid {last}/{top}, copied {copied}")
+        with transaction(con):
+            con.execute(f'DROP TABLE {old}')
+            con.execute('DELETE FROM migrate_state WHERE tbl=?', (old,))
+            con.execute(spec.view_ddl)
+        total += copied
+        log(f"[migrate] {spec.view}: now a view over {spec.table}")
+    return total
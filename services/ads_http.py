@@ -0,0 +1,156 @@
+# services/ads_http.py
+# Shared HTTP layer for the Amazon Ads API: one pooled keep-alive session,
+# per-endpoint token-bucket throttling, Retry-After aware retries and
+# request timing counters.
+# requests is imported on first use: it is most of this package's import cost
+import os, time, random, threading, email.utils
+
+POOL_SIZE   = int(os.getenv('VEGA_ADS_HTTP_POOL', '16'))
+MAX_RETRIES = int(os.getenv('VEGA_ADS_HTTP_RETRIES', '5'))
+MAX_BACKOFF = float(os.getenv('VEGA_ADS_HTTP_MAX_BACKOFF', '60'))
+RETRY_STATUS = (429, 500, 502, 503, 504)
+# Safe to send twice. Anything else (report creation POSTs) is only retried
+# when the server cannot have acted on it: a 429, or a connect timeout
+IDEMPOTENT = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# (requests per second, burst) per endpoint class. Override with
+# VEGA_ADS_RATE_<NAME>="rate:burst", e.g. VEGA_ADS_RATE_REPORTS="0.5:2".
+DEFAULT_RATES = {
+    'reports':  (1.0, 5),    # report creation
+    'status':   (5.0, 10),   # report polling
+    'download': (10.0, 10),  # S3 report files
+    'default':  (2.0, 5),    # profiles, campaign lists
+}
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate, self.burst = float(rate), float(burst)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until one token is available; returns seconds waited."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def drain(self, seconds):
+        """After a 429, hold every caller of this endpoint back for `seconds`."""
+        with self.lock:
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+def _rates():
+    out = dict(DEFAULT_RATES)
+    for name in out:
+        v = os.getenv(f'VEGA_ADS_RATE_{name.upper()}')
+        if v:
+            rate, _, burst = v.partition(':')
+            out[name] = (float(rate), float(burst or rate))
+    return out
+
+_buckets = {name: TokenBucket(*rb) for name, rb in _rates().items()}
+_stats = {}
+_stats_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+def session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, pool_block=True)
+                s.mount('https://', adapter)
+                s.mount('http://', adapter)
+                _session = s
+    return _session
+
+def _retry_after(resp, attempt):
+    v = resp.headers.get('Retry-After') if resp is not None else None
+    if v:
+        try:
+            return min(MAX_BACKOFF, max(0.0, float(v)))
+        except ValueError:
+            ts = email.utils.parsedate_to_datetime(v)
+            if ts is not None:
+                return min(MAX_BACKOFF, max(0.0, ts.timestamp() - time.time()))
+    return min(MAX_BACKOFF, (2 ** attempt) + random.uniform(0, 1))
+
+def _count(endpoint, **inc):
+    with _stats_lock:
+        st = _stats.setdefault(endpoint, {'calls': 0, 'errors': 0, 'throttled': 0, 'retries': 0,
+                                          'wait_ms': 0.0, 'total_ms': 0.0, 'max_ms': 0.0})
+        for k, v in inc.items():
+            if k == 'max_ms':
+                st[k] = max(st[k], v)
+            else:
+                st[k] += v
+
+def request(method, url, endpoint='default', idempotent=None, **kw):
+    """Send through the pooled session, throttled per endpoint class.
+
+    429/5xx and connection errors are retried up to MAX_RETRIES times,
+    honouring Retry-After when present. Non-idempotent requests (POST,
+    PATCH unless idempotent=True, e.g. read-only /list POSTs) are only
+    retried on 429 and connect timeouts: once sent, a retry could repeat
+    what the server already did. The final response is returned as-is
+    (callers still raise_for_status); the final exception is raised.
+    """
+    import requests
+    bucket = _buckets.get(endpoint) or _buckets['default']
+    kw.setdefault('timeout', 60)
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT
+    retry_status = RETRY_STATUS if idempotent else (429,)
+    retry_errors = (requests.ConnectionError, requests.Timeout) if idempotent else (requests.ConnectTimeout,)
+    for attempt in range(MAX_RETRIES + 1):
+        waited = bucket.acquire()
+        t0 = time.perf_counter()
+        try:
+            resp = session().request(method, url, **kw)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            _count(endpoint, calls=1, errors=1, wait_ms=waited * 1000)
+            if attempt == MAX_RETRIES or not isinstance(e, retry_errors):
+                raise
+            _count(endpoint, retries=1)
+            time.sleep(_retry_after(None, attempt))
+            continue
+        ms = (time.perf_counter() - t0) * 1000
+        _count(endpoint, calls=1, wait_ms=waited * 1000, total_ms=ms, max_ms=ms)
+        if resp.status_code not in retry_status or attempt == MAX_RETRIES:
+            if resp.status_code >= 400:
+                _count(endpoint, errors=1)
+            return resp
+        delay = _retry_after(resp, attempt)
+        _count(endpoint, retries=1)
+        resp.close()
+        if resp.status_code == 429:
+            # The drained bucket makes the next acquire() (ours included) wait
+            _count(endpoint, throttled=1)
+            bucket.drain(delay)
+        else:
+            time.sleep(delay)
+
+def get(url, endpoint='default', **kw):
+    return request('GET', url, endpoint, **kw)
+
+def post(url, endpoint='default', idempotent=False, **kw):
+    return request('POST', url, endpoint, idempotent, **kw)
+
+def stats():
+    """Snapshot of per-endpoint counters (calls, retries, throttled, timings)."""
+    with _stats_lock:
+        return {k: dict(v) for k, v in _stats.items()}
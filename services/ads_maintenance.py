@@ -0,0 +1,174 @@
+# services/ads_maintenance.py
+# Housekeeping for vega_ads.db that can run next to live readers and the
+# ingestion writer: per-table retention in small indexed delete batches,
+# bounded incremental vacuum steps and PRAGMA optimize. Every step is its
+# own short write transaction, so nobody waits on maintenance for more
+# than one batch.
+import os, time
+from services import ads_db
+
+# Days kept per table; 0 keeps everything. Override any subset with
+# VEGA_ADS_RETENTION="search_terms_v2=365,job_meta=30". Facts older than
+# this are gone for good, so archive them first (jobs/archive_ads.py).
+RETENTION_DAYS = {
+    'metrics_v2': 0,        # metrics_cumsum follows it, see _trim_cumsum
+    'search_terms_v2': 0,
+    'placements_v2': 0,
+    'keywords_v2': 0,
+    'metrics_campaign_week': 0,
+    'metrics_campaign_month': 0,
+    'metrics_adtype_day': 0,
+    'metrics_account_day': 0,
+    'job_meta': 90,         # finished report bookkeeping; watermarks are kept
+}
+# (table, day column) for the day-keyed tables
+_DAY_COLUMN = {
+    'metrics_v2': 'day', 'search_terms_v2': 'day', 'placements_v2': 'day', 'keywords_v2': 'day',
+    'metrics_campaign_week': 'week', 'metrics_campaign_month': 'month',
+    'metrics_adtype_day': 'day', 'metrics_account_day': 'day',
+}
+DELETE_BATCH = int(os.getenv('VEGA_ADS_MAINT_BATCH', '5000'))
+# Pages freed per incremental_vacuum step (4 KB pages: 2000 ~ 8 MB) and
+# the most steps one run takes
+VACUUM_PAGES = int(os.getenv('VEGA_ADS_VACUUM_PAGES', '2000'))
+VACUUM_MAX_STEPS = int(os.getenv('VEGA_ADS_VACUUM_MAX_STEPS', '200'))
+# Pause between batches so writers and readers get the lock in between
+PAUSE_SEC = float(os.getenv('VEGA_ADS_MAINT_PAUSE_MS', '20')) / 1000
+# The one-time auto_vacuum conversion is a full VACUUM (exclusive lock for
+# as long as it takes), so it only runs when asked for: set this for a
+# manual jobs/db_maintenance.py run in a quiet window
+CONVERT = os.getenv('VEGA_ADS_VACUUM_CONVERT', 'false').lower() in ('1', 'true', 'yes')
+
+def retention():
+    out = dict(RETENTION_DAYS)
+    for part in os.getenv('VEGA_ADS_RETENTION', '').split(','):
+        name, _, days = part.partition('=')
+        if name.strip() and days.strip():
+            out[name.strip()] = int(days)
+    return out
+
+def _batched(con, sql, params=()):
+    """Run a DELETE ... LIMIT-style statement until it deletes nothing."""
+    total = 0
+    while True:
+        with ads_db.transaction(con):
+            n = con.execute(sql, (*params, DELETE_BATCH)).rowcount
+        total += n
+        if n < DELETE_BATCH:
+            return total
+        time.sleep(PAUSE_SEC)
+
+def _trim_days(con, table, col, cutoff):
+    # Facts delete by rowid, batches picked through their (day, ...) index;
+    # WITHOUT ROWID rollups by primary key (they are small)
+    if table in {spec.table for spec in ads_db.SPECS}:
+        return _batched(con, f'DELETE FROM {table} WHERE rowid IN '
+                             f'(SELECT rowid FROM {table} WHERE {col} < ? LIMIT ?)', (cutoff,))
+    key = ads_db.ROLLUPS[table[len('metrics_'):]][1]
+    return _batched(con, f'DELETE FROM {table} WHERE ({key}) IN '
+                         f'(SELECT {key} FROM {table} WHERE {col} < ? LIMIT ?)', (cutoff,))
+
+def _trim_cumsum(con, cutoff, campaigns_per_batch=200):
+    # Keep each campaign's last running total before the cutoff: it is the
+    # base every later range total (and the writer's refresh) subtracts
+    # from. Per campaign this is one primary-key range delete.
+    keys = [r[0] for r in con.execute('SELECT campaignKey FROM ads_campaign ORDER BY campaignKey')]
+    total = 0
+    for i in range(0, len(keys), campaigns_per_batch):
+        with ads_db.transaction(con):
+            for k in keys[i:i + campaigns_per_batch]:
+                total += con.execute('''DELETE FROM metrics_cumsum WHERE campaignKey = ?1 AND day <
+                    (SELECT MAX(day) FROM metrics_cumsum WHERE campaignKey = ?1 AND day < ?2)''', (k, cutoff)).rowcount
+        time.sleep(PAUSE_SEC)
+    return total
+
+def _trim_job_meta(con, days):
+    since = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(time.time() - days * 86400))
+    return _batched(con, """DELETE FROM job_meta WHERE rowid IN (SELECT rowid FROM job_meta
+        WHERE status IN ('PERSISTED', 'FAILED') AND startedAt < ? LIMIT ?)""", (since,))
+
+def apply_retention(con, today=None, log=print):
+    """Delete rows past each table's retention; returns {table: rows deleted}."""
+    today = ads_db.to_day(today or time.strftime('%Y-%m-%d'))
+    out = {}
+    for table, days in retention().items():
+        if days <= 0:
+            continue
+        if table == 'job_meta':
+            out[table] = _trim_job_meta(con, days)
+        elif table in _DAY_COLUMN:
+            cutoff = today - days
+            if table == 'metrics_campaign_week':
+                cutoff = ads_db.week_of(cutoff)
+            elif table == 'metrics_campaign_month':
+                cutoff = ads_db.month_of(cutoff)
+            out[table] = _trim_days(con, table, _DAY_COLUMN[table], cutoff)
+            if table == 'metrics_v2' and out[table]:
+                out['metrics_cumsum'] = _trim_cumsum(con, cutoff)
+        else:
+            log(f'[maintenance] no retention rule for {table}; skipped')
+            continue
+        if out[table]:
+            log(f'[maintenance] {table}: deleted {out[table]} rows older than {days} days')
+    return out
+
+# ---- space ----
+def ensure_incremental(con, log=print):
+    """Switch the file to auto_vacuum=INCREMENTAL.
+
+    New databases get it from ads_db.PRAGMAS; an existing file needs one
+    full VACUUM to convert, which locks out readers and the writer while it
+    runs, so run() only does it when asked (convert=True or CONVERT).
+    Returns True if the file was converted now.
+    """
+    if con.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+        return False
+    log('[maintenance] converting to auto_vacuum=INCREMENTAL (one-time full VACUUM)')
+    con.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    con.execute('VACUUM')
+    return True
+
+def incremental_vacuum(con, pages=None, max_steps=None):
+    """Return free pages to the OS in bounded steps; returns pages freed."""
+    pages, max_steps = pages or VACUUM_PAGES, max_steps or VACUUM_MAX_STEPS
+    freed = 0
+    for _ in range(max_steps):
+        free = con.execute('PRAGMA freelist_count').fetchone()[0]
+        if not free:
+            break
+        # execute() steps the pragma once, which frees a single page;
+        # executescript runs it to completion
+        con.executescript(f'BEGIN IMMEDIATE; PRAGMA incremental_vacuum({min(pages, free)}); COMMIT;')
+        freed += free - con.execute('PRAGMA freelist_count').fetchone()[0]
+        time.sleep(PAUSE_SEC)
+    return freed
+
+def optimize(con):
+    # analysis_limit bounds each ANALYZE to a sample; optimize only
+    # re-analyzes tables whose stats have drifted
+    con.execute('PRAGMA analysis_limit=1000')
+    con.execute('PRAGMA optimize')
+    # PASSIVE never waits on readers
+    return con.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchone()[:]
+
+def run(con=None, convert=None, log=print):
+    """Retention, then space reclaim, then planner stats. Returns a summary.
+
+    convert=None follows VEGA_ADS_VACUUM_CONVERT for the one-time
+    auto_vacuum conversion (see ensure_incremental).
+    """
+    own = con is None
+    if own:
+        from services.amazon_ads_service import _db
+        con = _db()
+    try:
+        t0 = time.perf_counter()
+        deleted = apply_retention(con, log=log)
+        converted = ensure_incremental(con, log) if (CONVERT if convert is None else convert) else False
+        freed = incremental_vacuum(con)
+        optimize(con)
+        return {'deleted': deleted, 'converted': converted, 'freed_pages': freed,
+                'seconds': round(time.perf_counter() - t0, 2)}
+    finally:
+        if own:
+            con.close()
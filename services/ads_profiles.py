@@ -0,0 +1,53 @@
+# services/ads_profiles.py
+# Which advertiser profiles ingestion covers, and the Ads API base URL of
+# each region. Discovery itself (GET /v2/profiles per region) lives in
+# amazon_ads_service; this module only holds the config and selection rules.
+import os
+from collections import namedtuple
+
+REGION_BASE = {
+    "na": "https://advertising-api.amazon.com",
+    "eu": "https://advertising-api-eu.amazon.com",
+    "fe": "https://advertising-api-fe.amazon.com",
+}
+
+# AMZ_ADS_PROFILE_IDS: "all", or a comma list of profileIds / country codes
+# (e.g. "US,CA,MX" or "1234567890,CA"). Unset keeps the single
+# AMZ_ADS_PROFILE_ID deployment on AMZ_ADS_API_BASE, without discovery.
+PROFILE_IDS = os.getenv('AMZ_ADS_PROFILE_IDS', '').strip()
+# AMZ_ADS_REGIONS: regions to discover profiles in, e.g. "na,eu"
+REGIONS = os.getenv('AMZ_ADS_REGIONS', '').strip()
+
+Profile = namedtuple('Profile', 'profile_id base country')
+
+def region_of(base):
+    base = (base or '').rstrip('/')
+    return next((r for r, b in REGION_BASE.items() if b == base), None)
+
+def regions(default_base=None):
+    names = [r.strip().lower() for r in REGIONS.split(',') if r.strip()]
+    if not names:
+        names = [region_of(default_base) or 'na']
+    unknown = [r for r in names if r not in REGION_BASE]
+    if unknown:
+        raise ValueError(f'Unknown AMZ_ADS_REGIONS entries: {unknown} (use {sorted(REGION_BASE)})')
+    return names
+
+def wanted():
+    """None for "all", else the set of requested profileIds / country codes."""
+    if PROFILE_IDS.lower() in ('all', '*'):
+        return None
+    return {p.strip().upper() for p in PROFILE_IDS.split(',') if p.strip()}
+
+def select(discovered, want):
+    """Filter [(region, profile dict)] from /v2/profiles down to Profile tuples."""
+    out, seen = [], set()
+    for region, p in discovered:
+        pid, cc = str(p.get('profileId') or ''), (p.get('countryCode') or '').upper()
+        if not pid or pid in seen:
+            continue
+        if want is not None and pid not in want and cc not in want:
+            continue
+        seen.add(pid)
+        out.append(Profile(pid, REGION_BASE[region], cc))
+    return out
@@ -0,0 +1,149 @@
+# services/ads_query.py
+# Read side of vega_ads.db for the HTTP API: filtered, optionally grouped
+# slices of the v2 fact tables, paged by keyset (never OFFSET) so page N
+# costs the same as page 1.
+from services import ads_db, cursors
+
+KINDS = {spec.view: spec for spec in ads_db.SPECS}
+GROUPS = ('day', 'week', 'month', 'campaign')
+
+# Cursors (services/cursors.py) hold the last row's integer sort key
+def _after(cursor, n):
+    return cursors.decode(cursor, (int,) * n)
+
+# ---- filters ----
+def _filters(ad_types=None, campaign_ids=None, profile_id=None, owner='c'):
+    where, params = [], []
+    if ad_types:
+        where.append(f"{owner}.adType IN ({','.join('?' * len(ad_types))})")
+        params += [t.upper() for t in ad_types]
+    if campaign_ids:
+        where.append(f"c.campaignId IN ({','.join('?' * len(campaign_ids))})")
+        params += [ads_db._num(c) for c in campaign_ids]
+    if profile_id is not None:
+        where.append(f'{owner}.profileId=?')
+        params.append(int(profile_id) if str(profile_id) else 0)
+    return where, params
+
+def ratios(row):
+    """Add ACoS (% of sales) and ROAS to an aggregated row, in place."""
+    cost, sales = row.get('cost') or 0, row.get('sales14d') or 0
+    row['acos'] = round(cost / sales * 100, 2) if sales else None
+    row['roas'] = round(sales / cost, 2) if cost else None
+    return row
+
+def _page(rows, limit, key_of):
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (cursors.encode(key_of(rows[-1])) if more and rows else None)
+
+# ---- per-campaign totals from metrics_cumsum ----
+def campaign_totals(con, lo, hi, ad_types=None, campaign_ids=None, profile_id=None, after=None, limit=None):
+    """Totals per campaign over [lo, hi] (day numbers): two seeks per campaign.
+
+    Campaigns without rows in the range are skipped. `after`/`limit` page
+    by campaignKey. Rows are dicts incl. campaignKey, without ratios.
+    """
+    where, params = _filters(ad_types, campaign_ids, profile_id)
+    if after is not None:
+        where.append('c.campaignKey > ?')
+        params.append(after)
+    diff = ', '.join(f'COALESCE(h.{m}, 0) - COALESCE(l.{m}, 0) AS {m}' for m in ads_db.MEASURES)
+    sql = f"""WITH k AS (
+            SELECT c.*,
+                (SELECT day FROM metrics_cumsum WHERE campaignKey=c.campaignKey AND day<=? ORDER BY day DESC LIMIT 1) AS dh,
+                (SELECT day FROM metrics_cumsum WHERE campaignKey=c.campaignKey AND day<? ORDER BY day DESC LIMIT 1) AS dl
+            FROM ads_campaign c {('WHERE ' + ' AND '.join(where)) if where else ''})
+        SELECT k.campaignKey, CASE k.profileId WHEN 0 THEN '' ELSE CAST(k.profileId AS TEXT) END AS profileId,
+               k.adType, CAST(k.campaignId AS TEXT) AS campaignId, k.campaignName, {diff}
+        FROM k LEFT JOIN metrics_cumsum h ON h.campaignKey=k.campaignKey AND h.day=k.dh
+               LEFT JOIN metrics_cumsum l ON l.campaignKey=k.campaignKey AND l.day=k.dl
+        WHERE k.dh IS NOT NULL AND k.dh IS NOT k.dl
+        ORDER BY k.campaignKey{' LIMIT ?' if limit else ''}"""
+    rows = [dict(r) for r in con.execute(sql, [hi, lo, *params, *([limit] if limit else [])])]
+    for r in rows:
+        # Differences of running float totals: drop the rounding noise
+        r['cost'], r['sales14d'] = round(r['cost'], 6), round(r['sales14d'], 6)
+    return rows
+
+# ---- bucket grouping ----
+# (SQL bucket expression over f.day, output column, label SQL over the bucket)
+_BUCKETS = {
+    'day':   ('f.day', 'date', "date(b * 86400, 'unixepoch')"),
+    'week':  ('f.day - (f.day + 3) % 7', 'week', "date(b * 86400, 'unixepoch')"),
+    'month': ("CAST(strftime('%Y%m', f.day * 86400, 'unixepoch') AS INTEGER)", 'month',
+              "substr(b, 1, 4) || '-' || substr(b, 5, 2)"),
+}
+
+def _next_bucket_day(group_by, b):
+    # First day after bucket b; buckets are monotonic in day, so the keyset
+    # becomes a plain day lower bound on the index
+    if group_by == 'day':
+        return b + 1
+    if group_by == 'week':
+        return b + 7
+    return ads_db.month_bounds(b)[1] + 1
+
+def query(con, kind, lo, hi, ad_types=None, campaign_ids=None, profile_id=None,
+          group_by=None, limit=500, cursor=None):
+    """One page of `kind` rows for days [lo, hi]; returns (items, next_cursor).
+
+    group_by None returns daily rows ordered by (day, campaign[, term]);
+    'day'/'week'/'month' sum every filtered row per bucket; 'campaign' sums
+    the range per campaign. Raises ValueError on a bad kind/group/cursor.
+    """
+    spec = KINDS.get(kind)
+    if spec is None:
+        raise ValueError(f'unknown kind: {kind}')
+    if group_by and group_by not in GROUPS:
+        raise ValueError(f'unknown group_by: {group_by}')
+    sums = ', '.join(f'SUM(f.{m}) AS {m}' for m in spec.measures)
+
+    if group_by == 'campaign':
+        after = _after(cursor, 1)[0] if cursor else None
+        if spec is ads_db.METRICS:
+            rows = campaign_totals(con, lo, hi, ad_types, campaign_ids, profile_id, after, limit + 1)
+        else:
+            where, params = _filters(ad_types, campaign_ids, profile_id)
+            if after is not None:
+                where.append('f.campaignKey > ?')
+                params.append(after)
+            rows = [dict(r) for r in con.execute(f"""
+                SELECT f.campaignKey, {ads_db.PROFILE_TEXT} AS profileId, c.adType,
+                       CAST(c.campaignId AS TEXT) AS campaignId, c.campaignName, {sums}
+                FROM {spec.table} f JOIN ads_campaign c ON c.campaignKey = f.campaignKey
+                WHERE {' AND '.join(['f.day BETWEEN ? AND ?'] + where)}
+                GROUP BY f.campaignKey ORDER BY f.campaignKey LIMIT ?""", [lo, hi, *params, limit + 1])]
+        rows, nxt = _page(rows, limit, lambda r: [r['campaignKey']])
+        return [ratios({k: v for k, v in r.items() if k != 'campaignKey'}) for r in rows], nxt
+
+    if group_by:
+        expr, col, label = _BUCKETS[group_by]
+        start = _next_bucket_day(group_by, _after(cursor, 1)[0]) if cursor else lo
+        if spec is ads_db.METRICS and group_by == 'day' and not campaign_ids:
+            # Served from the per-adType daily rollup
+            where, params = _filters(ad_types, None, profile_id, owner='f')
+            src = 'metrics_adtype_day f'
+        else:
+            where, params = _filters(ad_types, campaign_ids, profile_id)
+            src = f'{spec.table} f JOIN ads_campaign c ON c.campaignKey = f.campaignKey'
+        rows = [dict(r) for r in con.execute(f"""
+            SELECT b, {label} AS {col}, {', '.join(spec.measures)} FROM (
+                SELECT {expr} AS b, {sums} FROM {src}
+                WHERE {' AND '.join(['f.day BETWEEN ? AND ?'] + where)}
+                GROUP BY b ORDER BY b LIMIT ?)""", [start, hi, *params, limit + 1])]
+        rows, nxt = _page(rows, limit, lambda r: [r['b']])
+        return [ratios({k: v for k, v in r.items() if k != 'b'}) for r in rows], nxt
+
+    keys = ['f.day', 'f.campaignKey'] + [f'f.{c}' for c in spec.natural_key[2:]]
+    where, params = _filters(ad_types, campaign_ids, profile_id)
+    if cursor:
+        where.append(f"({', '.join(keys)}) > ({', '.join('?' * len(keys))})")
+        params += _after(cursor, len(keys))
+    cols = spec.select_cols + [f'{k} AS _k{i}' for i, k in enumerate(keys)]
+    rows = [dict(r) for r in con.execute(f"""
+        SELECT {', '.join(cols)} FROM {spec.from_sql}
+        WHERE {' AND '.join(['f.day BETWEEN ? AND ?'] + where)}
+        ORDER BY {', '.join(keys)} LIMIT ?""", [lo, hi, *params, limit + 1])]
+    rows, nxt = _page(rows, limit, lambda r: [r[f'_k{i}'] for i in range(len(keys))])
+    return [{k: v for k, v in r.items() if not k.startswith('_k')} for r in rows], nxt
@@ -0,0 +1,133 @@
+# services/ads_refresh_jobs.py
+# Background ads refreshes for the HTTP API. POST /v1/ads/refresh submits a
+# job here and returns its id straight away; the report create/poll/
+# download/persist cycle runs on a small worker pool and GET
+# /v1/ads/refresh/{id} reads its progress per report.
+#
+# A refresh for the same window, ad types, profile and mode as one that is
+# still queued or running is coalesced into it (same job id back).
+# The registry lives in this process's memory; the report pipeline itself
+# stays resumable through job_meta (resume_reports) across restarts.
+import os, uuid, threading, traceback
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+
+# Concurrent refresh jobs; each already fans out over REPORT_WORKERS and
+# persists through one SQLite writer, so more rarely helps
+WORKERS = int(os.getenv('VEGA_ADS_REFRESH_WORKERS', '1'))
+# Finished jobs kept for GET after they end
+KEEP_FINISHED = int(os.getenv('VEGA_ADS_REFRESH_KEEP', '100'))
+
+ACTIVE = ('QUEUED', 'RUNNING')
+
+@dataclass
+class RefreshJob:
+    job_id: str
+    start: str
+    end: str
+    ad_types: tuple
+    profile_id: str = None
+    incremental: bool = True
+    status: str = 'QUEUED'        # QUEUED -> RUNNING -> SUCCEEDED | PARTIAL | FAILED
+    created_at: str = None
+    started_at: str = None
+    finished_at: str = None
+    error: str = None
+    coalesced: int = 0            # later submissions folded into this job
+    reports: dict = field(default_factory=dict)   # (profile, kind, adType) -> progress
+    totals: dict = None           # run_reports() counts per kind, once finished
+
+    @property
+    def key(self):
+        return (self.start, self.end, tuple(sorted(self.ad_types)), self.profile_id or '', self.incremental)
+
+    def to_dict(self):
+        return {
+            'job_id': self.job_id, 'status': self.status,
+            'window_start': self.start, 'window_end': self.end,
+            'ad_types': list(self.ad_types), 'profile_id': self.profile_id, 'incremental': self.incremental,
+            'created_at': self.created_at, 'started_at': self.started_at, 'finished_at': self.finished_at,
+            'error': self.error, 'coalesced': self.coalesced,
+            'reports': [dict(r) for r in self.reports.values()],
+            'totals': self.totals,
+        }
+
+_lock = threading.Lock()
+_jobs = {}       # job_id -> RefreshJob
+_active = {}     # key -> job_id of the queued/running job
+_pool = None
+
+def _utcnow():
+    return datetime.utcnow().isoformat(timespec='seconds')
+
+def _executor():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=max(1, WORKERS), thread_name_prefix='ads-refresh')
+    return _pool
+
+def submit(start, end, ad_types, profile_id=None, incremental=True):
+    """Queue a refresh (or join the identical one in flight); returns (snapshot, coalesced)."""
+    job = RefreshJob(uuid.uuid4().hex, str(start), str(end), tuple(t.upper() for t in ad_types),
+                     profile_id or None, bool(incremental), created_at=_utcnow())
+    with _lock:
+        running = _jobs.get(_active.get(job.key))
+        if running is not None and running.status in ACTIVE:
+            running.coalesced += 1
+            return running.to_dict(), True
+        _jobs[job.job_id] = job
+        _active[job.key] = job.job_id
+        _prune()
+        snapshot = job.to_dict()
+    _executor().submit(_run, job)
+    return snapshot, False
+
+def get(job_id):
+    """Progress snapshot of a job, or None if unknown (or pruned)."""
+    with _lock:
+        job = _jobs.get(job_id)
+        return job.to_dict() if job else None
+
+def _prune():
+    done = [j for j in _jobs.values() if j.status not in ACTIVE]
+    for j in sorted(done, key=lambda j: j.finished_at or '')[:max(0, len(done) - KEEP_FINISHED)]:
+        del _jobs[j.job_id]
+
+def _progress(job):
+    def update(report, stage, stats):
+        name = (report.profile_id, report.kind, report.ad_type)
+        with _lock:
+            r = job.reports.setdefault(name, {'profile_id': report.profile_id, 'kind': report.kind,
+                                              'ad_type': report.ad_type})
+            r.update(stats, stage=stage, report_id=report.report_id,
+                     start=str(report.start), end=str(report.end), updated_at=_utcnow())
+    return update
+
+def _run(job):
+    from services import amazon_ads_service as ads
+    with _lock:
+        job.status, job.started_at = 'RUNNING', _utcnow()
+    try:
+        ads._init_db()
+        profiles = None
+        if job.profile_id:
+            profiles = [p for p in ads.select_profiles() if p.profile_id == job.profile_id]
+            if not profiles:
+                raise ValueError(f'profile {job.profile_id} is not configured for ingestion')
+        totals = ads.run_reports(job.start, job.end, which=job.ad_types, incremental=job.incremental,
+                                 profiles=profiles, progress=_progress(job))
+        with _lock:
+            failed = any(r['stage'] in ('FAILED', 'TIMED_OUT') for r in job.reports.values())
+            done = any(r['stage'] == 'PERSISTED' for r in job.reports.values())
+            job.totals = totals
+            job.status = 'SUCCEEDED' if not failed else 'PARTIAL' if done else 'FAILED'
+    except Exception as e:
+        traceback.print_exc()
+        with _lock:
+            job.status, job.error = 'FAILED', str(e)[:500]
+    finally:
+        with _lock:
+            job.finished_at = _utcnow()
+            if _active.get(job.key) == job.job_id:
+                del _active[job.key]
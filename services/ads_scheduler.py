@@ -1,16 +1,18 @@
 # services/ads_scheduler.py
 import os, threading, time, traceback
 from datetime import datetime, timedelta
-from services.amazon_ads_service import (
-    _init_db, fetch_metrics, fetch_search_terms, fetch_placements, quick_diag
-)
+from services.amazon_ads_service import _init_db, run_reports, resume_reports, quick_diag
+from services import ads_http, ads_maintenance
 
 FREQ_MIN = int(os.getenv("SCHEDULE_FREQUENCY_MIN", "60"))
 LOOKBACK_DAYS = int(os.getenv("ADS_LOOKBACK_DAYS", "30"))
 # Accept SP,SB,SD (any order, case-insensitive)
 AD_TYPES = [t.strip().upper() for t in os.getenv("ADS_TYPES", "SP,SB,SD").split(",") if t.strip()]
+# Retention / incremental vacuum / optimize cadence; 0 disables
+MAINT_HOURS = float(os.getenv("VEGA_ADS_MAINT_HOURS", "24"))
 
 _started = False
+_last_maint = 0.0
 
 def _run_once():
     # Light diag to confirm profile & campaign visibility when AMZ_ADS_DEBUG=1
@@ -24,28 +26,27 @@ def _run_once():
     start = end - timedelta(days=LOOKBACK_DAYS)
     s, e = start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
 
-    inserted = {"metrics": 0, "search_terms": 0, "placements": 0}
+    # All kinds × AD_TYPES are created up front and polled concurrently; each
+    # pulls only from its watermark (minus the restatement tail), floored at start
+    res = run_reports(s, e, which=AD_TYPES, incremental=True)
 
-    # Correct usage: pass the date window once, with which=AD_TYPES
-    try:
-        m = fetch_metrics(s, e, which=AD_TYPES) or []
-        inserted["metrics"] += len(m)
-    except Exception as ex:
-        print(f"[scheduler] fetch_metrics error:", ex)
-
-    try:
-        srows = fetch_search_terms(s, e, which=AD_TYPES) or []
-        inserted["search_terms"] += len(srows)
-    except Exception as ex:
-        print(f"[scheduler] fetch_search_terms error:", ex)
+    # Per kind: rows received, and how many were inserted/updated/unchanged
+    http = {k: {c: v[c] for c in ('calls', 'retries', 'throttled')} for k, v in ads_http.stats().items()}
+    print({'scheduler': True, 'ok': True, 'window': [s, e], **res, 'http': http})
+    _maybe_maintain()
 
+def _maybe_maintain():
+    # After ingestion, in this thread, so it never competes with the writer.
+    # Never the one-time full-VACUUM conversion: that is a manual job
+    global _last_maint
+    if MAINT_HOURS <= 0 or time.time() - _last_maint < MAINT_HOURS * 3600:
+        return
+    _last_maint = time.time()
     try:
-        prows = fetch_placements(s, e, which=AD_TYPES) or []
-        inserted["placements"] += len(prows)
-    except Exception as ex:
-        print(f"[scheduler] fetch_placements error:", ex)
-
-    print({'scheduler': True, 'ok': True, 'window': [s, e], **inserted})
+        print({'maintenance': ads_maintenance.run(convert=False)})
+    except Exception:
+        print("[scheduler] maintenance failed:")
+        traceback.print_exc()
 
 def _loop():
     global _started
@@ -53,6 +54,12 @@ def _loop():
         return
     _started = True
     print(f"[scheduler] starting; freq={FREQ_MIN} min, lookback_days={LOOKBACK_DAYS}, types={AD_TYPES}")
+    try:
+        # Finish reports a previous process created but never persisted
+        resume_reports()
+    except Exception:
+        print("[scheduler] resume failed:")
+        traceback.print_exc()
     try:
         _run_once()
     except Exception:
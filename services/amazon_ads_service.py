@@ -1,4 +1,8 @@
-import os, time, json, gzip, io, sqlite3, requests, pathlib
+import os, re, time, json, zlib, codecs, hashlib, pathlib, threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
 
 # Debug toggle
 DEBUG = os.getenv("AMZ_ADS_DEBUG", "0").lower() in ("1", "true", "yes", "on")
@@ -31,84 +35,157 @@ SPAPI_ENDPOINT          = _env('SPAPI_ENDPOINT', os.getenv('AMZ_ENDPOINT', 'http
 
 INCLUDE_ARCHIVED = os.getenv('VEGA_ADS_INCLUDE_ARCHIVED', 'false').lower() == 'true'
 CACHE_DAYS = int(os.getenv('VEGA_ADS_CACHE_DAYS', '35'))
+# Max reports polled/downloaded at once by the report engine, over all profiles
+REPORT_WORKERS = int(os.getenv('VEGA_ADS_REPORT_WORKERS', '24'))
+# Rows handed to the SQLite writer per batch while a report streams in
+REPORT_BATCH_ROWS = int(os.getenv('VEGA_ADS_BATCH_ROWS', '20000'))
+# Days before each watermark that are re-pulled because 14-day attribution still moves
+RESTATEMENT_DAYS = int(os.getenv('VEGA_ADS_RESTATEMENT_DAYS', '3'))
+# Identical report requests within this many minutes reuse the existing reportId
+REPORT_REUSE_MIN = int(os.getenv('VEGA_ADS_REPORT_REUSE_MIN', '60'))
+# A CREATING claim older than this is taken to be from a crashed run and dropped
+REPORT_CLAIM_SEC = int(os.getenv('VEGA_ADS_REPORT_CLAIM_SEC', '600'))
+# Unfinished reports younger than this are resumed after a restart
+REPORT_RESUME_HOURS = int(os.getenv('VEGA_ADS_REPORT_RESUME_HOURS', '24'))
+# Reports polled/downloaded at once for any single profile
+PROFILE_CONCURRENCY = int(os.getenv('VEGA_ADS_PROFILE_CONCURRENCY', '9'))
 
 # ---- Safe writable DATA_DIR ----
+# Resolved on first use, not at import: the API, the Streamlit app and cron
+# jobs import this module well before (or without ever) touching the db.
 from services.amazon_ads_service_patch_dbdir import ensure_writable_dir
-DATA_DIR, _VEGA_DIR_WARN = ensure_writable_dir()
-if _VEGA_DIR_WARN:
-    print(_VEGA_DIR_WARN)
-DB_PATH = os.path.join(DATA_DIR, 'vega_ads.db')
+_paths = None
+
+def _data_paths():
+    global _paths
+    if _paths is None:
+        data_dir, warn = ensure_writable_dir()
+        if warn:
+            print(warn)
+        _paths = (data_dir, os.path.join(data_dir, 'vega_ads.db'))
+    return _paths
+
+def __getattr__(name):
+    # DATA_DIR / DB_PATH remain importable module attributes
+    if name == 'DATA_DIR':
+        return _data_paths()[0]
+    if name == 'DB_PATH':
+        return _data_paths()[1]
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
 
-_token = {'val': None, 'exp': 0}
 def _now(): return int(time.time())
 
 def _access_token():
-    if _token['val'] and _token['exp'] > _now() + 60:
-        return _token['val']
-    r = requests.post('https://api.amazon.com/auth/o2/token', data={
-        'grant_type': 'refresh_token',
-        'refresh_token': REFRESH,
-        'client_id': CLIENT_ID,
-        'client_secret': CLIENT_SEC,
-    }, timeout=60)
-    r.raise_for_status()
-    j = r.json()
-    _token['val'] = j['access_token']
-    _token['exp'] = _now() + int(j.get('expires_in', 3600))
-    return _token['val']
+    # Shared broker: memory + file cache across processes
+    return lwa_tokens.get_access_token(CLIENT_ID, CLIENT_SEC, REFRESH)
+
+def _drop_token(headers):
+    lwa_tokens.invalidate(CLIENT_ID, REFRESH, headers['Authorization'][len('Bearer '):])
+
+# ---- Profile scope ----
+# Calls default to AMZ_ADS_PROFILE_ID on ADS_BASE. The report engine runs
+# each profile's jobs inside profile_scope() so the same helpers serve
+# every profile and region; the scope is per thread.
+_scope = threading.local()
+
+@contextmanager
+def profile_scope(profile_id, base=None):
+    prev = getattr(_scope, 'cur', None)
+    _scope.cur = (str(profile_id or ''), (base or ADS_BASE).rstrip('/'))
+    try:
+        yield
+    finally:
+        _scope.cur = prev
+
+def _profile_id():
+    cur = getattr(_scope, 'cur', None)
+    return cur[0] if cur else str(PROFILE_ID or '')
+
+def _base():
+    cur = getattr(_scope, 'cur', None)
+    return cur[1] if cur else ADS_BASE
 
 def _base_headers():
-    """Only send Scope header if PROFILE_ID is truthy."""
+    """Only send Scope header if the current profile id is truthy."""
     h = {
         'Authorization': f'Bearer {_access_token()}',
         'Amazon-Advertising-API-ClientId': CLIENT_ID,
         'Accept': 'application/json',
     }
-    if PROFILE_ID:
-        h['Amazon-Advertising-API-Scope'] = str(PROFILE_ID)
+    if _profile_id():
+        h['Amazon-Advertising-API-Scope'] = _profile_id()
     return h
 
 # ---------------- DB helpers ----------------
+from services import ads_db, ads_http, ads_profiles, ads_query, lwa_tokens
+
 def _db():
-    con = sqlite3.connect(DB_PATH, check_same_thread=False)
-    con.row_factory = sqlite3.Row
-    return con
+    # This thread's pooled connection; close() just hands it back. The
+    # first call in a process creates/upgrades the schema.
+    if not _schema_ready:
+        _init_db()
+    return ads_db.connect(_data_paths()[1])
 
-def _init_db():
-    con = _db()
+_schema_lock = threading.Lock()
+_schema_ready = False
+
+def _init_db(force=False):
+    """Create/upgrade the schema; runs once per process unless forced."""
+    global _schema_ready
+    if _schema_ready and not force:
+        return
+    with _schema_lock:
+        if _schema_ready and not force:
+            return
+        _create_schema()
+        _schema_ready = True
+
+def _create_schema():
+    con = ads_db.connect(_data_paths()[1])
     cur = con.cursor()
-    cur.execute('''CREATE TABLE IF NOT EXISTS metrics(
-        adType TEXT, date TEXT, campaignId TEXT, campaignName TEXT,
-        impressions REAL, clicks REAL, cost REAL, purchases14d REAL, sales14d REAL,
-        profileId TEXT, createdAt TEXT DEFAULT (datetime('now'))
-    )''')
-    cur.execute('CREATE UNIQUE INDEX IF NOT EXISTS ux_metrics ON metrics(adType,date,campaignId,profileId)')
-    cur.execute('''CREATE TABLE IF NOT EXISTS search_terms(
-        adType TEXT, date TEXT, campaignId TEXT, keywordText TEXT, searchTerm TEXT,
-        impressions REAL, clicks REAL, cost REAL, sales14d REAL, profileId TEXT,
-        createdAt TEXT DEFAULT (datetime('now'))
-    )''')
-    cur.execute('''CREATE TABLE IF NOT EXISTS placements(
-        adType TEXT, date TEXT, campaignId TEXT, placement TEXT,
-        impressions REAL, clicks REAL, cost REAL, sales14d REAL, profileId TEXT,
-        createdAt TEXT DEFAULT (datetime('now'))
-    )''')
+    # metrics / search_terms / placements are views over the v2 tables
+    # (integer days and ids, dictionary-encoded text); see services/ads_db.py
+    pending = ads_db.init_schema(con)
     cur.execute('''CREATE TABLE IF NOT EXISTS job_meta(
         kind TEXT, adType TEXT, reportId TEXT, status TEXT, url TEXT, startedAt TEXT, completedAt TEXT
     )''')
-    con.commit(); con.close()
+    ads_db.ensure_columns(con, 'job_meta', {
+        'profileId': 'TEXT', 'watermark': 'TEXT', 'configHash': 'TEXT',
+        'startDate': 'TEXT', 'endDate': 'TEXT', 'updatedAt': 'TEXT', 'error': 'TEXT', 'apiBase': 'TEXT',
+    })
+    cur.execute('CREATE INDEX IF NOT EXISTS ix_job_meta_kind ON job_meta(kind, adType, profileId, status)')
+    cur.execute('CREATE INDEX IF NOT EXISTS ix_job_meta_config ON job_meta(configHash, startedAt)')
+    con.commit()
+    try:
+        if pending:
+            # Pre-v2 database: a one-time, resumable copy (jobs/migrate_ads_v2.py
+            # runs the same step ahead of a deploy)
+            print(f"[ads] migrating {', '.join(pending)} to the v2 layout")
+            ads_db.migrate_v2(con)
+    finally:
+        con.close()
 
-_init_db()
+def migrate_ads_db(chunk=50000):
+    """Finish any pending pre-v2 -> v2 migration; returns rows copied."""
+    # Not through _db(): its first-use schema init would migrate uncounted
+    con = ads_db.connect(_data_paths()[1])
+    try:
+        ads_db.init_schema(con)
+        return ads_db.migrate_v2(con, chunk=chunk)
+    finally:
+        con.close()
 
 # -------- Utilities / diagnostics --------
+# All Ads calls go through services.ads_http (pooled session, throttling,
+# Retry-After backoff); ads_http.stats() has per-endpoint counters.
 def _get_json(path, params=None):
-    url = f"{ADS_BASE}{path}"
+    url = f"{_base()}{path}"
     h = _base_headers()
-    r = requests.get(url, headers=h, params=params, timeout=60)
+    r = ads_http.get(url, headers=h, params=params, timeout=60)
     if r.status_code == 401:
-        _token['val'] = None
+        _drop_token(h)
         h = _base_headers()
-        r = requests.get(url, headers=h, params=params, timeout=60)
+        r = ads_http.get(url, headers=h, params=params, timeout=60)
     r.raise_for_status()
     try:
         return r.json()
@@ -137,6 +214,26 @@ def quick_diag():
 def get_profiles():
     return _get_json('/v2/profiles')
 
+def select_profiles():
+    """Profiles ingestion covers, as ads_profiles.Profile tuples.
+
+    Without AMZ_ADS_PROFILE_IDS this is the single AMZ_ADS_PROFILE_ID on
+    ADS_BASE. Otherwise profiles are discovered in every AMZ_ADS_REGIONS
+    region and filtered by id / country code ("all" keeps every one).
+    """
+    if not ads_profiles.PROFILE_IDS:
+        return [ads_profiles.Profile(str(PROFILE_ID or ''), ADS_BASE, '')]
+    found = []
+    for region in ads_profiles.regions(ADS_BASE):
+        try:
+            with profile_scope('', ads_profiles.REGION_BASE[region]):
+                found += [(region, p) for p in get_profiles() or []]
+        except Exception as e:
+            print(f"[ads] profile discovery in {region} failed:", e)
+    profiles = ads_profiles.select(found, ads_profiles.wanted())
+    _dbg("profiles selected:", [(p.profile_id, p.country) for p in profiles])
+    return profiles
+
 # -------- Campaign lists --------
 def _filter_archived(rows):
     if INCLUDE_ARCHIVED: return rows
@@ -152,7 +249,7 @@ def list_sp_campaigns(count=1000, start_index=0):
     h['Accept'] = 'application/vnd.spcampaign.v3+json'
     h['Content-Type'] = 'application/vnd.spcampaign.v3+json'
     body = {'startIndex': start_index, 'count': count}
-    r = requests.post(f'{ADS_BASE}/sp/campaigns/list', headers=h, json=body, timeout=60)
+    r = ads_http.post(f'{_base()}/sp/campaigns/list', headers=h, json=body, timeout=60, idempotent=True)
     r.raise_for_status()
     data = r.json().get('campaigns', [])
     return _filter_archived(data)
@@ -160,7 +257,7 @@ def list_sp_campaigns(count=1000, start_index=0):
 def list_sb_campaigns():
     h = _base_headers()
     h['Accept'] = 'application/vnd.sbcampaignresource.v4+json'
-    r = requests.post(f'{ADS_BASE}/sb/v4/campaigns/list', headers=h, timeout=60)
+    r = ads_http.post(f'{_base()}/sb/v4/campaigns/list', headers=h, timeout=60, idempotent=True)
     r.raise_for_status()
     data = r.json().get('campaigns', [])
     return _filter_archived(data)
@@ -169,7 +266,7 @@ def list_sd_campaigns(count=1000, start_index=0, state_filter='enabled,paused'):
     h = _base_headers()
     h['Amazon-Advertising-API-Version'] = '3'
     params = {'startIndex': start_index, 'count': count, 'stateFilter': state_filter}
-    r = requests.get(f'{ADS_BASE}/sd/campaigns', headers=h, params=params, timeout=60)
+    r = ads_http.get(f'{_base()}/sd/campaigns', headers=h, params=params, timeout=60)
     r.raise_for_status()
     data = r.json()
     return _filter_archived(data)
@@ -203,7 +300,7 @@ def _post_report(url, body, media_candidates):
         h = _base_headers()
         h['Accept'] = accept
         h['Content-Type'] = content
-        r = requests.post(url, headers=h, json=body, timeout=90)
+        r = ads_http.post(url, 'reports', headers=h, json=body, timeout=90)
         if r.status_code in (406, 415):
             last = r
             continue
@@ -214,14 +311,14 @@ def _post_report(url, body, media_candidates):
 
 def _poll_report(ad_type, report_id, timeout_sec=240, interval=3):
     paths = [
-        f'{ADS_BASE}/{ad_type.lower()}/reports/{report_id}',
-        f'{ADS_BASE}/reports/{report_id}',
+        f'{_base()}/{ad_type.lower()}/reports/{report_id}',
+        f'{_base()}/reports/{report_id}',
     ]
     start = time.time()
     while time.time() - start < timeout_sec:
         for p in paths:
             h = _base_headers()
-            r = requests.get(p, headers=h, timeout=60)
+            r = ads_http.get(p, 'status', headers=h, timeout=60)
             if r.status_code == 404:
                 continue
             r.raise_for_status()
@@ -232,31 +329,77 @@ def _poll_report(ad_type, report_id, timeout_sec=240, interval=3):
         time.sleep(interval)
     raise TimeoutError(f'{ad_type} report not ready after {timeout_sec}s')
 
+# Reports are streamed: gunzipped chunk by chunk and parsed record by record,
+# so peak memory is one batch of rows regardless of report size.
+def _iter_report_bytes(url, chunk_size=64 * 1024):
+    with ads_http.get(url, 'download', stream=True, timeout=180) as r:
+        r.raise_for_status()
+        it = r.iter_content(chunk_size=chunk_size)
+        head = next(it, b'')
+        if head[:2] != b'\x1f\x8b':
+            yield head
+            yield from it
+            return
+        d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        for chunk in _chain(head, it):
+            while chunk:
+                yield d.decompress(chunk)
+                # Concatenated gzip members: restart on the leftover bytes
+                chunk = d.unused_data
+                if chunk:
+                    yield d.flush()
+                    d = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        yield d.flush()
+
+def _chain(head, it):
+    yield head
+    yield from it
+
+_SKIP = re.compile(r'[\s,\[\]]*')
+_decoder = json.JSONDecoder()
+
+def _iter_records(chunks):
+    """Yield objects from a JSON array or NDJSON byte stream, incrementally."""
+    dec = codecs.getincrementaldecoder('utf-8')(errors='ignore')
+    buf = ''
+    for chunk in chunks:
+        buf += dec.decode(chunk)
+        pos = 0
+        while True:
+            pos = _SKIP.match(buf, pos).end()
+            if pos >= len(buf):
+                break
+            try:
+                obj, pos2 = _decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break  # partial record, wait for more bytes
+            yield obj
+            pos = pos2
+        buf = buf[pos:]
+    buf += dec.decode(b'', final=True)
+    if buf[_SKIP.match(buf).end():]:
+        raise ValueError(f'Truncated report stream ({len(buf)} trailing chars)')
+
+def _iter_batches(records, size=None):
+    size = size or REPORT_BATCH_ROWS
+    batch = []
+    for r in records:
+        batch.append(r)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 def _download_report(url):
-    r = requests.get(url, timeout=180)
-    r.raise_for_status()
-    data = r.content
-    try:
-        with gzip.GzipFile(fileobj=io.BytesIO(data)) as gz:
-            data = gz.read()
-    except Exception:
-        pass
-    txt = data.decode('utf-8', errors='ignore').strip()
-    if txt.startswith('['):
-        return json.loads(txt)
-    return [json.loads(line) for line in txt.splitlines() if line.strip()]
+    return list(_iter_records(_iter_report_bytes(url)))
 
 def upsert_metrics(rows):
-    con = _db(); cur = con.cursor()
-    for r in rows:
-        cur.execute("""INSERT OR REPLACE INTO metrics
-            (adType,date,campaignId,campaignName,impressions,clicks,cost,purchases14d,sales14d,profileId)
-            VALUES (?,?,?,?,?,?,?,?,?,?)""", (
-                r.get('adType'), str(r.get('date')), str(r.get('campaignId')), r.get('campaignName'),
-                r.get('impressions',0), r.get('clicks',0), r.get('cost',0),
-                r.get('purchases14d',0), r.get('sales14d',0), str(PROFILE_ID or "")
-            ))
-    con.commit(); con.close()
+    con = _db()
+    try:
+        return ads_db.bulk_write(con, ads_db.METRICS, rows, _profile_id())
+    finally:
+        con.close()
 
 # ---------- Metrics ----------
 def create_sp_report(start_date, end_date, time_unit='DAILY'):
@@ -273,7 +416,7 @@ def create_sp_report(start_date, end_date, time_unit='DAILY'):
         },
     }
     media = [('application/vnd.spreport.v3+json', 'application/json')]
-    return _post_report(f'{ADS_BASE}/sp/reports', body, media).json().get('reportId')
+    return _post_report(f'{_base()}/sp/reports', body, media).json().get('reportId')
 
 def create_sb_report(start_date, end_date, time_unit='DAILY'):
     body = {
@@ -289,7 +432,7 @@ def create_sb_report(start_date, end_date, time_unit='DAILY'):
         },
     }
     media = [('application/vnd.sbreport.v4+json', 'application/json')]
-    return _post_report(f'{ADS_BASE}/sb/reports', body, media).json().get('reportId')
+    return _post_report(f'{_base()}/sb/reports', body, media).json().get('reportId')
 
 def create_sd_report(start_date, end_date, time_unit='DAILY'):
     body = {
@@ -305,30 +448,17 @@ def create_sd_report(start_date, end_date, time_unit='DAILY'):
         },
     }
     media = [('application/vnd.sdreport.v3+json', 'application/json')]
-    return _post_report(f'{ADS_BASE}/sd/reports', body, media).json().get('reportId')
+    return _post_report(f'{_base()}/sd/reports', body, media).json().get('reportId')
 
 def fetch_metrics(start_date, end_date, which=('SP','SB','SD'), persist=True):
-    jobs = []
-    if 'SP' in which: jobs.append(('sp', create_sp_report(start_date, end_date)))
-    if 'SB' in which: jobs.append(('sb', create_sb_report(start_date, end_date)))
-    if 'SD' in which: jobs.append(('sd', create_sd_report(start_date, end_date)))
-    out = []
-    for ad_type, rid in jobs:
-        if not rid: continue
-        meta = _poll_report(ad_type, rid)
-        url = meta.get('url') or meta.get('location')
-        rows = _download_report(url) if url else []
-        for r in rows: r['adType'] = ad_type.upper()
-        out.extend(rows)
-    if persist and out: upsert_metrics(out)
-    return out
+    return run_reports(start_date, end_date, kinds=('metrics',), which=which, persist=persist, collect=True)['metrics']['data']
 
 # ---------- Search Terms ----------
 def create_search_terms_report(ad_type, start_date, end_date):
     cfg = {
-        'SP': (f'{ADS_BASE}/sp/reports', 'application/vnd.spreport.v3+json'),
-        'SB': (f'{ADS_BASE}/sb/reports', 'application/vnd.sbreport.v4+json'),
-        'SD': (f'{ADS_BASE}/sd/reports', 'application/vnd.sdreport.v3+json'),
+        'SP': (f'{_base()}/sp/reports', 'application/vnd.spreport.v3+json'),
+        'SB': (f'{_base()}/sb/reports', 'application/vnd.sbreport.v4+json'),
+        'SD': (f'{_base()}/sd/reports', 'application/vnd.sdreport.v3+json'),
     }[ad_type]
     url, accept = cfg
     body = {
@@ -350,44 +480,21 @@ def create_search_terms_report(ad_type, start_date, end_date):
     return _post_report(url, body, [(accept, 'application/json')]).json().get('reportId')
 
 def upsert_search_terms(rows):
-    con = _db(); cur = con.cursor()
-    for r in rows:
-        cur.execute("""INSERT INTO search_terms
-            (adType,date,campaignId,keywordText,searchTerm,impressions,clicks,cost,sales14d,profileId)
-            VALUES (?,?,?,?,?,?,?,?,?,?)""", (
-                r.get('adType'), str(r.get('date')), str(r.get('campaignId')),
-                r.get('keywordText') or r.get('keyword') or '', r.get('searchTerm'),
-                r.get('impressions',0), r.get('clicks',0), r.get('cost',0),
-                r.get('sales14d',0), str(PROFILE_ID or "")
-            ))
-    con.commit(); con.close()
+    con = _db()
+    try:
+        return ads_db.bulk_write(con, ads_db.SEARCH_TERMS, rows, _profile_id())
+    finally:
+        con.close()
 
 def fetch_search_terms(start_date, end_date, which=('SP','SB','SD')):
-    jobs = []
-    for t in which:
-        try:
-            rid = create_search_terms_report(t, start_date, end_date)
-            jobs.append((t.lower(), rid))
-        except Exception as e:
-            _dbg("search-terms rid error", t, e)
-            continue
-    out = []
-    for ad_type, rid in jobs:
-        if not rid: continue
-        meta = _poll_report(ad_type, rid)
-        url = meta.get('url') or meta.get('location')
-        rows = _download_report(url) if url else []
-        for r in rows: r['adType'] = ad_type.upper()
-        out.extend(rows)
-    if out: upsert_search_terms(out)
-    return out
+    return run_reports(start_date, end_date, kinds=('search_terms',), which=which, collect=True)['search_terms']['data']
 
 # ---------- Placements ----------
 def create_placements_report(ad_type, start_date, end_date):
     cfg = {
-        'SP': (f'{ADS_BASE}/sp/reports', 'application/vnd.spreport.v3+json'),
-        'SB': (f'{ADS_BASE}/sb/reports', 'application/vnd.sbreport.v4+json'),
-        'SD': (f'{ADS_BASE}/sd/reports', 'application/vnd.sdreport.v3+json'),
+        'SP': (f'{_base()}/sp/reports', 'application/vnd.spreport.v3+json'),
+        'SB': (f'{_base()}/sb/reports', 'application/vnd.sbreport.v4+json'),
+        'SD': (f'{_base()}/sd/reports', 'application/vnd.sdreport.v3+json'),
     }[ad_type]
     url, accept = cfg
     body = {
@@ -409,33 +516,510 @@ def create_placements_report(ad_type, start_date, end_date):
     return _post_report(url, body, [(accept, 'application/json')]).json().get('reportId')
 
 def upsert_placements(rows):
-    con = _db(); cur = con.cursor()
-    for r in rows:
-        cur.execute("""INSERT INTO placements
-            (adType,date,campaignId,placement,impressions,clicks,cost,sales14d,profileId)
-            VALUES (?,?,?,?,?,?,?,?,?)""", (
-                r.get('adType'), str(r.get('date')), str(r.get('campaignId')),
-                r.get('placement',''), r.get('impressions',0), r.get('clicks',0),
-                r.get('cost',0), r.get('sales14d',0), str(PROFILE_ID or "")
-            ))
-    con.commit(); con.close()
+    con = _db()
+    try:
+        return ads_db.bulk_write(con, ads_db.PLACEMENTS, rows, _profile_id())
+    finally:
+        con.close()
 
 def fetch_placements(start_date, end_date, which=('SP','SB','SD')):
-    jobs = []
-    for t in which:
+    return run_reports(start_date, end_date, kinds=('placements',), which=which, collect=True)['placements']['data']
+
+# ---------- Keywords / targets ----------
+# One row per keyword (SP/SB) or target (SD) per day; ppc_opt.bid_rules
+# reads them through keyword_performance()
+_TARGET_COLUMNS = {
+    'SP': ['keywordId', 'keyword', 'matchType'],
+    'SB': ['keywordId', 'keywordText', 'matchType'],
+    'SD': ['targetingId', 'targetingText'],
+}
+
+def create_keywords_report(ad_type, start_date, end_date):
+    cfg = {
+        'SP': (f'{_base()}/sp/reports', 'application/vnd.spreport.v3+json'),
+        'SB': (f'{_base()}/sb/reports', 'application/vnd.sbreport.v4+json'),
+        'SD': (f'{_base()}/sd/reports', 'application/vnd.sdreport.v3+json'),
+    }[ad_type]
+    url, accept = cfg
+    body = {
+        'name': f'vega-{ad_type.lower()}-keywords',
+        'startDate': str(start_date),
+        'endDate': str(end_date),
+        'configuration': {
+            'adProduct': {
+                'SP': 'SPONSORED_PRODUCTS',
+                'SB': 'SPONSORED_BRANDS',
+                'SD': 'SPONSORED_DISPLAY'
+            }[ad_type],
+            'groupBy': ['targeting'],
+            'columns': ['date','campaignId','campaignName','adGroupId', *_TARGET_COLUMNS[ad_type],
+                        'impressions','clicks','cost','purchases14d','sales14d'],
+            'timeUnit': 'DAILY',
+            'format': 'GZIP_JSON',
+        },
+    }
+    return _post_report(url, body, [(accept, 'application/json')]).json().get('reportId')
+
+def upsert_keywords(rows):
+    con = _db()
+    try:
+        return ads_db.bulk_write(con, ads_db.KEYWORDS, rows, _profile_id())
+    finally:
+        con.close()
+
+def fetch_keywords(start_date, end_date, which=('SP','SB','SD')):
+    return run_reports(start_date, end_date, kinds=('keywords',), which=which, collect=True)['keywords']['data']
+
+# ACoS% reported for keywords with spend but no attributed sales
+ACOS_NO_SALES = 999.0
+
+def keyword_performance(start_date, end_date, profile_id=None, ad_types=None):
+    """Per-keyword totals over [start_date, end_date] in the shape
+    utils.ppc_opt.bid_rules expects (Keyword, MatchType, Campaign, Clicks,
+    Orders, ACoS%, ROAS, ...). Empty DataFrame when nothing is stored."""
+    import pandas as pd  # only the dashboards need it; keeps the import light
+    lo, hi = ads_db.to_day(_as_date(start_date)), ads_db.to_day(_as_date(end_date))
+    where, params = ['f.day BETWEEN ? AND ?'], [lo, hi]
+    if ad_types:
+        where.append(f"c.adType IN ({','.join('?' * len(ad_types))})")
+        params += [t.upper() for t in ad_types]
+    if profile_id is not None:
+        where.append('c.profileId=?')
+        params.append(int(profile_id) if str(profile_id) else 0)
+    # Grouped on integer keys first; the text is joined once per keyword
+    sql = f"""SELECT c.adType AS AdType, c.campaignName AS Campaign, CAST(g.keywordId AS TEXT) AS KeywordId,
+                     k.term AS Keyword, m.term AS MatchType, g.Impressions, g.Clicks, g.Spend, g.Orders, g.Sales
+        FROM (SELECT f.campaignKey, f.keywordId, MAX(f.keywordKey) AS keywordKey, MAX(f.matchTypeKey) AS matchTypeKey,
+                     SUM(f.impressions) AS Impressions, SUM(f.clicks) AS Clicks, SUM(f.cost) AS Spend,
+                     SUM(f.purchases14d) AS Orders, SUM(f.sales14d) AS Sales
+              FROM keywords_v2 f JOIN ads_campaign c ON c.campaignKey = f.campaignKey
+              WHERE {' AND '.join(where)} GROUP BY f.campaignKey, f.keywordId) g
+        JOIN ads_campaign c ON c.campaignKey = g.campaignKey
+        JOIN ads_term k ON k.termKey = g.keywordKey JOIN ads_term m ON m.termKey = g.matchTypeKey
+        ORDER BY g.Spend DESC"""
+    con = _db()
+    try:
+        df = pd.read_sql_query(sql, con, params=params)
+    finally:
+        con.close()
+    # Spend without sales would be an infinite ACoS: it gets ACOS_NO_SALES,
+    # which bid_rules' waste and high-ACoS rules act on. No spend at all is 0.
+    acos = df['Spend'] / df['Sales'] * 100
+    df['ACoS%'] = acos.where(df['Sales'] > 0, (df['Spend'] > 0) * ACOS_NO_SALES).round(2)
+    df['ROAS'] = (df['Sales'] / df['Spend']).where(df['Spend'] > 0, 0.0).round(2)
+    return df
+
+# ---------- Rollup reads ----------
+# Pre-aggregated metrics maintained by the writer (see ads_db ROLLUPS):
+# a few hundred rows per query instead of the daily fact table. Ids come
+# back as text, like the legacy views, so rows from both merge on the same keys.
+_ROLLUP_SQL = {
+    'campaign_week': ("""SELECT {pid} AS profileId, c.adType, CAST(c.campaignId AS TEXT) AS campaignId, c.campaignName,
+        date(r.week * 86400, 'unixepoch') AS week, {m} FROM metrics_campaign_week r
+        JOIN ads_campaign c ON c.campaignKey = r.campaignKey WHERE r.week BETWEEN ? AND ?""", 'week, c.adType, c.campaignName'),
+    'campaign_month': ("""SELECT {pid} AS profileId, c.adType, CAST(c.campaignId AS TEXT) AS campaignId, c.campaignName,
+        substr(r.month, 1, 4) || '-' || substr(r.month, 5, 2) AS month, {m} FROM metrics_campaign_month r
+        JOIN ads_campaign c ON c.campaignKey = r.campaignKey WHERE r.month BETWEEN ? AND ?""", 'month, c.adType, c.campaignName'),
+    'adtype_day': ("""SELECT {pid} AS profileId, r.adType, date(r.day * 86400, 'unixepoch') AS date, {m}
+        FROM metrics_adtype_day r WHERE r.day BETWEEN ? AND ?""", 'r.day, r.adType'),
+    'account_day': ("""SELECT {pid} AS profileId, date(r.day * 86400, 'unixepoch') AS date, {m}
+        FROM metrics_account_day r WHERE r.day BETWEEN ? AND ?""", 'r.day'),
+}
+
+def read_rollup(grain, start_date, end_date, profile_id=None, ad_type=None):
+    """Rows of one rollup ('campaign_week', 'campaign_month', 'adtype_day',
+    'account_day') overlapping [start_date, end_date], as dicts."""
+    sql, order = _ROLLUP_SQL[grain]
+    lo, hi = ads_db.to_day(_as_date(start_date)), ads_db.to_day(_as_date(end_date))
+    if grain == 'campaign_week':
+        lo = ads_db.week_of(lo)
+    elif grain == 'campaign_month':
+        lo, hi = ads_db.month_of(lo), ads_db.month_of(hi)
+    owner = 'r' if grain in ('adtype_day', 'account_day') else 'c'
+    sql = sql.format(m=', '.join(f'r.{c}' for c in ads_db.MEASURES),
+                     pid=ads_db.PROFILE_TEXT.replace('c.profileId', f'{owner}.profileId'))
+    params = [lo, hi]
+    if profile_id is not None:
+        sql += f' AND {owner}.profileId=?'
+        params.append(int(profile_id) if str(profile_id) else 0)
+    if ad_type and grain != 'account_day':
+        sql += f' AND {owner}.adType=?'
+        params.append(ad_type.upper())
+    con = _db()
+    try:
+        return [dict(r) for r in con.execute(f'{sql} ORDER BY {order}', params)]
+    finally:
+        con.close()
+
+def range_totals(start_date, end_date, campaign_ids=None, profile_id=None, ad_type=None):
+    """Per-campaign totals plus ACoS/ROAS over [start_date, end_date].
+
+    Reads metrics_cumsum: two seeks per campaign whatever the window length,
+    so 7, 60 or 400 days cost the same. campaign_ids=None means every
+    campaign matching profile_id / ad_type.
+    """
+    if campaign_ids is not None:
+        campaign_ids = list(campaign_ids)
+        if not campaign_ids:
+            return []
+    lo, hi = ads_db.to_day(_as_date(start_date)), ads_db.to_day(_as_date(end_date))
+    con = _db()
+    try:
+        rows = ads_query.campaign_totals(con, lo, hi, [ad_type] if ad_type else None,
+                                         campaign_ids, profile_id)
+    finally:
+        con.close()
+    return [ads_query.ratios({k: v for k, v in r.items() if k != 'campaignKey'}) for r in rows]
+
+# ---------- Watermarks ----------
+# job_meta rows with status WATERMARK record, per (kind, adType, profileId),
+# the last report day that was fully persisted. Incremental runs start
+# RESTATEMENT_DAYS before it instead of re-pulling the whole lookback.
+def _as_date(d):
+    if isinstance(d, datetime): return d.date()
+    if isinstance(d, date): return d
+    return date.fromisoformat(str(d)[:10])
+
+def get_watermark(kind, ad_type, profile_id=None, con=None):
+    own = con is None
+    con = con or _db()
+    try:
+        row = con.execute("SELECT watermark FROM job_meta WHERE status='WATERMARK' AND kind=? AND adType=? AND profileId=?",
+                          (kind, ad_type, _profile_id() if profile_id is None else str(profile_id))).fetchone()
+        return _as_date(row[0]) if row and row[0] else None
+    finally:
+        if own: con.close()
+
+def set_watermark(kind, ad_type, day, profile_id=None, con=None):
+    own = con is None
+    con = con or _db()
+    key = (kind, ad_type, _profile_id() if profile_id is None else str(profile_id))
+    now = datetime.utcnow().isoformat(timespec='seconds')
+    try:
+        with ads_db.transaction(con):
+            cur = con.execute("UPDATE job_meta SET watermark=?, completedAt=? WHERE status='WATERMARK' AND kind=? AND adType=? AND profileId=?",
+                              (str(day), now) + key)
+            if cur.rowcount == 0:
+                con.execute("INSERT INTO job_meta(kind, adType, profileId, status, watermark, completedAt) VALUES (?,?,?,'WATERMARK',?,?)",
+                            key + (str(day), now))
+    finally:
+        if own: con.close()
+
+def _advance_watermark(job, con=None):
+    """Move the watermark to job.end after an incremental pull persisted.
+
+    Only incremental jobs (job.floor set) count, and only when the pulled
+    window leaves no gap: it must reach back to the day after the current
+    watermark, or to the lookback floor when there is no watermark yet (or
+    it is older than the floor). The watermark never moves backwards. Ad-hoc windows and resumed reports
+    leave it alone; the next incremental run re-pulls from the old one.
+    """
+    if job.floor is None:
+        return False
+    own = con is None
+    con = con or _db()
+    try:
+        wm = get_watermark(job.kind, job.ad_type, job.profile_id, con)
+        start, end, floor = _as_date(job.start), _as_date(job.end), _as_date(job.floor)
+        if wm is not None and end <= wm:
+            return False
+        if start > (floor if wm is None else max(floor, wm + timedelta(days=1))):
+            return False
+        set_watermark(job.kind, job.ad_type, end, job.profile_id, con)
+        return True
+    finally:
+        if own: con.close()
+
+def _incremental_start(kind, ad_type, floor, end, tail, profile_id=None):
+    wm = get_watermark(kind, ad_type, profile_id)
+    if wm is None:
+        return floor
+    return min(end, max(floor, wm - timedelta(days=max(tail, 1) - 1)))
+
+# ---------- Report engine ----------
+# Every requested (profile, kind, ad type) report is created up front, then
+# polled, downloaded and persisted concurrently, so a refresh takes roughly
+# as long as the slowest report instead of the sum of all of them. Jobs are
+# interleaved across profiles and each profile runs at most
+# PROFILE_CONCURRENCY of them at once.
+#
+# Each report is tracked in job_meta through
+#   PENDING -> COMPLETED -> DOWNLOADED -> PERSISTED   (or FAILED)
+# so a restart can resume outstanding reportIds (resume_reports) and an
+# identical request inside REPORT_REUSE_MIN reuses the existing report.
+# Before the create POST a run claims the config with a CREATING row
+# (no reportId yet; resume_reports skips it), so a concurrent run waits
+# for that report instead of requesting a duplicate.
+# An optional progress(job, stage, stats) callback sees the same stages,
+# plus PERSISTING after every stored batch (stats are running counts).
+REPORT_KINDS = ('metrics', 'search_terms', 'placements', 'keywords')
+OPEN_STATES = ('PENDING', 'COMPLETED', 'DOWNLOADED')
+_write_lock = threading.Lock()  # SQLite has one writer; serialize persists
+
+@dataclass
+class ReportJob:
+    kind: str
+    ad_type: str
+    start: date
+    end: date
+    report_id: str = None
+    meta_id: int = None    # job_meta rowid
+    skip: bool = False     # already PERSISTED inside the reuse window
+    profile_id: str = ''
+    base: str = None       # Ads API base URL of the profile's region
+    floor: date = None     # incremental runs only: lookback floor (see _advance_watermark)
+
+    @property
+    def config_hash(self):
+        cfg = [self.kind, self.ad_type, self.profile_id, str(self.start), str(self.end)]
+        return hashlib.sha1(json.dumps(cfg).encode()).hexdigest()
+
+def _utcnow():
+    return datetime.utcnow().isoformat(timespec='seconds')
+
+def _set_state(job, status, **cols):
+    cols.update(status=status, updatedAt=_utcnow())
+    sets = ','.join(f'{c}=?' for c in cols)
+    with _write_lock:
+        con = _db()
         try:
-            rid = create_placements_report(t, start_date, end_date)
-            jobs.append((t.lower(), rid))
-        except Exception as e:
-            _dbg("placements rid error", t, e)
-            continue
-    out = []
-    for ad_type, rid in jobs:
-        if not rid: continue
-        meta = _poll_report(ad_type, rid)
+            with ads_db.transaction(con):
+                con.execute(f'UPDATE job_meta SET {sets} WHERE rowid=?', (*cols.values(), job.meta_id))
+        finally:
+            con.close()
+
+def _claim_report(job, persist, collect):
+    """Reuse a matching report from job_meta, or create one and record it PENDING."""
+    while True:
+        row = _find_or_claim(job)
+        if row is None:
+            break
+        if row['status'] != 'CREATING':
+            job.meta_id, job.report_id = row['rowid'], row['reportId']
+            job.skip = row['status'] == 'PERSISTED' and persist and not collect
+            _dbg("reusing report", job.kind, job.ad_type, job.report_id, row['status'])
+            return job
+        # Another run is creating this report; take its reportId once recorded
+        time.sleep(1)
+    try:
+        job.report_id = _create_report(job)
+    except BaseException:
+        _drop_claim(job)
+        raise
+    if job.report_id:
+        _set_state(job, 'PENDING', reportId=job.report_id)
+    else:
+        _drop_claim(job)
+    return job
+
+def _find_or_claim(job):
+    # Lookup and claim in one write transaction: two runs can't both miss
+    now = datetime.utcnow()
+    since = (now - timedelta(minutes=REPORT_REUSE_MIN)).isoformat(timespec='seconds')
+    stale = (now - timedelta(seconds=REPORT_CLAIM_SEC)).isoformat(timespec='seconds')
+    states = (*OPEN_STATES, 'PERSISTED', 'CREATING')
+    with _write_lock:
+        con = _db()
+        try:
+            with ads_db.transaction(con):
+                con.execute("DELETE FROM job_meta WHERE configHash=? AND status='CREATING' AND updatedAt<?",
+                            (job.config_hash, stale))
+                row = con.execute(f"""SELECT rowid, reportId, status FROM job_meta
+                    WHERE configHash=? AND startedAt>=? AND status IN ({','.join('?' * len(states))})
+                    ORDER BY startedAt DESC LIMIT 1""", (job.config_hash, since, *states)).fetchone()
+                if row is None:
+                    cur = con.execute("""INSERT INTO job_meta(kind, adType, profileId, apiBase, status,
+                        configHash, startDate, endDate, startedAt, updatedAt) VALUES (?,?,?,?,'CREATING',?,?,?,?,?)""",
+                        (job.kind, job.ad_type, job.profile_id, _base(), job.config_hash,
+                         str(job.start), str(job.end), _utcnow(), _utcnow()))
+                    job.meta_id = cur.lastrowid
+            return row
+        finally:
+            con.close()
+
+def _drop_claim(job):
+    with _write_lock:
+        con = _db()
+        try:
+            with ads_db.transaction(con):
+                con.execute("DELETE FROM job_meta WHERE rowid=? AND status='CREATING'", (job.meta_id,))
+        finally:
+            con.close()
+    job.meta_id = None
+
+def _create_report(job):
+    kind, ad_type, start_date, end_date = job.kind, job.ad_type, job.start, job.end
+    if kind == 'metrics':
+        create = {'SP': create_sp_report, 'SB': create_sb_report, 'SD': create_sd_report}[ad_type]
+        return create(start_date, end_date)
+    if kind == 'search_terms':
+        return create_search_terms_report(ad_type, start_date, end_date)
+    if kind == 'placements':
+        return create_placements_report(ad_type, start_date, end_date)
+    if kind == 'keywords':
+        return create_keywords_report(ad_type, start_date, end_date)
+    raise ValueError(f'Unknown report kind: {kind}')
+
+def _upsert(kind, rows):
+    return {'metrics': upsert_metrics, 'search_terms': upsert_search_terms, 'placements': upsert_placements,
+            'keywords': upsert_keywords}[kind](rows)
+
+_COUNTS = ('rows', 'inserted', 'updated', 'unchanged')
+
+def _add_counts(into, counts):
+    for c in _COUNTS:
+        into[c] += counts.get(c, 0)
+
+def _notify(progress, job, stage, stats=None, error=None):
+    if progress is None:
+        return
+    info = {c: (stats or {}).get(c, 0) for c in _COUNTS}
+    if error is not None:
+        info['error'] = str(error)[:500]
+    try:
+        progress(job, stage, info)
+    except Exception as e:
+        _dbg("progress callback error:", e)
+
+def _collect_report(job, persist, collect, progress=None):
+    stats = dict.fromkeys(_COUNTS, 0)
+    if collect: stats['data'] = []
+    if job.skip:
+        _notify(progress, job, 'PERSISTED', stats)
+        return stats
+    try:
+        meta = _poll_report(job.ad_type, job.report_id)
         url = meta.get('url') or meta.get('location')
-        rows = _download_report(url) if url else []
-        for r in rows: r['adType'] = ad_type.upper()
-        out.extend(rows)
-    if out: upsert_placements(out)
+        _set_state(job, 'COMPLETED', url=url, completedAt=_utcnow())
+        _notify(progress, job, 'COMPLETED', stats)
+        if url:
+            for batch in _iter_batches(_iter_records(_iter_report_bytes(url))):
+                for r in batch: r['adType'] = job.ad_type
+                if persist:
+                    with _write_lock:
+                        _add_counts(stats, _upsert(job.kind, batch))
+                else:
+                    stats['rows'] += len(batch)
+                if collect: stats['data'].extend(batch)
+                _notify(progress, job, 'PERSISTING', stats)
+        _set_state(job, 'DOWNLOADED')
+        _notify(progress, job, 'DOWNLOADED', stats)
+    except Exception as e:
+        # A poll timeout leaves the report PENDING so the next run resumes it
+        if not isinstance(e, TimeoutError):
+            _set_state(job, 'FAILED', error=str(e)[:500])
+        raise
+    if persist:
+        with _write_lock:
+            _advance_watermark(job)
+        _set_state(job, 'PERSISTED')
+        _notify(progress, job, 'PERSISTED', stats)
+    return stats
+
+_profile_slots = {}
+_profile_slots_lock = threading.Lock()
+
+def _in_profile(fn, job, *args):
+    """Run fn(job, ...) in the job's profile scope, within its concurrency slot."""
+    with _profile_slots_lock:
+        slot = _profile_slots.setdefault(job.profile_id, threading.BoundedSemaphore(max(1, PROFILE_CONCURRENCY)))
+    with slot, profile_scope(job.profile_id, job.base):
+        return fn(job, *args)
+
+def _interleave(jobs):
+    # Round-robin across profiles so one large account can't fill the pool
+    by_profile = {}
+    for j in jobs:
+        by_profile.setdefault(j.profile_id, []).append(j)
+    queues = list(by_profile.values())
+    return [q[i] for i in range(max(map(len, queues), default=0)) for q in queues if i < len(q)]
+
+def _run_jobs(jobs, persist=True, collect=False, workers=None, kinds=REPORT_KINDS, progress=None):
+    out = {k: {**dict.fromkeys(_COUNTS, 0), **({'data': []} if collect else {})} for k in kinds}
+    if not jobs:
+        return out
+    n = max(1, min(len(jobs), workers or REPORT_WORKERS))
+    with ThreadPoolExecutor(max_workers=n, thread_name_prefix='ads-report') as pool:
+        ready = [j for j in jobs if j.report_id]  # resumed reports skip the claim step
+        claims = {pool.submit(_in_profile, _claim_report, j, persist, collect): j
+                  for j in _interleave(jobs) if not j.report_id}
+        for fut in as_completed(claims):
+            j = claims[fut]
+            try:
+                fut.result()
+            except Exception as e:
+                print(f"[ads] create {j.kind} {j.ad_type} (profile {j.profile_id or '-'}) error:", e)
+                _notify(progress, j, 'FAILED', error=e)
+                continue
+            if j.report_id:
+                ready.append(j)
+                _notify(progress, j, 'PENDING')
+            else:
+                _notify(progress, j, 'FAILED', error='no reportId returned')
+        _dbg("reports ready:", [(j.profile_id, j.kind, j.ad_type, str(j.start), str(j.end), j.report_id) for j in ready])
+        running = {pool.submit(_in_profile, _collect_report, j, persist, collect, progress): j
+                   for j in _interleave(ready)}
+        for fut in as_completed(running):
+            j = running[fut]
+            try:
+                res = fut.result()
+            except Exception as e:
+                print(f"[ads] {j.kind} {j.ad_type} (profile {j.profile_id or '-'}) report error:", e)
+                # A poll timeout stays PENDING in job_meta for resume_reports
+                _notify(progress, j, 'TIMED_OUT' if isinstance(e, TimeoutError) else 'FAILED', error=e)
+                continue
+            _add_counts(out[j.kind], res)
+            if collect: out[j.kind]['data'].extend(res['data'])
     return out
+
+def run_reports(start_date, end_date, kinds=REPORT_KINDS, which=('SP','SB','SD'), persist=True, collect=False,
+                workers=None, incremental=False, tail=None, profiles=None, progress=None):
+    """Fetch every profile × kind × ad type report for the window concurrently.
+
+    Returns {kind: {'rows', 'inserted', 'updated', 'unchanged'}}; rows are
+    streamed to SQLite in batches (unchanged ones are not rewritten) and only
+    kept (under 'data') when collect=True. A failing report is logged and
+    skipped so the others still land.
+
+    incremental=True treats start_date as a floor: each report starts
+    `tail` (default RESTATEMENT_DAYS) days before its stored watermark, and
+    only incremental runs advance watermarks.
+    `profiles` defaults to select_profiles(); counts are summed over them.
+    `progress(job, stage, stats)` is called as each report moves through
+    PENDING/COMPLETED/PERSISTING/DOWNLOADED/PERSISTED (or FAILED/TIMED_OUT).
+    """
+    start_date, end_date = _as_date(start_date), _as_date(end_date)
+    tail = RESTATEMENT_DAYS if tail is None else tail
+    profiles = select_profiles() if profiles is None else profiles
+    jobs = []
+    for p in profiles:
+        for k in kinds:
+            for t in which:
+                if not (t and t.strip()): continue
+                t = t.strip().upper()
+                s = _incremental_start(k, t, start_date, end_date, tail, p.profile_id) if incremental else start_date
+                jobs.append(ReportJob(k, t, s, end_date, profile_id=p.profile_id, base=p.base,
+                                      floor=start_date if incremental else None))
+    return _run_jobs(jobs, persist, collect, workers, kinds, progress)
+
+def resume_reports(max_age_hours=None, workers=None):
+    """Finish reports a previous process left PENDING/COMPLETED/DOWNLOADED, for every profile.
+
+    Downloads are streamed, so DOWNLOADED-but-not-PERSISTED reports are
+    fetched again; natural-key upserts make the replay idempotent.
+    """
+    hours = REPORT_RESUME_HOURS if max_age_hours is None else max_age_hours
+    since = (datetime.utcnow() - timedelta(hours=hours)).isoformat(timespec='seconds')
+    con = _db()
+    try:
+        rows = con.execute(f"""SELECT rowid, kind, adType, profileId, apiBase, reportId, startDate, endDate FROM job_meta
+            WHERE status IN ({','.join('?' * len(OPEN_STATES))}) AND startedAt>=?""",
+            (*OPEN_STATES, since)).fetchall()
+    finally:
+        con.close()
+    jobs = [ReportJob(r['kind'], r['adType'], _as_date(r['startDate']), _as_date(r['endDate']),
+                      report_id=r['reportId'], meta_id=r['rowid'], profile_id=r['profileId'] or '', base=r['apiBase'])
+            for r in rows if r['kind'] in REPORT_KINDS]
+    if jobs:
+        print(f"[ads] resuming {len(jobs)} outstanding report(s)")
+    return _run_jobs(jobs, workers=workers)
@@ -0,0 +1,55 @@
+# services/cursors.py
+# Opaque keyset cursors shared by every paged endpoint (api.py, backend/app.py
+# and the /v1/ads reads): urlsafe base64, unpadded, of a JSON list holding
+# the last row's sort key, optionally led by a tag such as the sort it was
+# issued for. Paged responses are {"items": [...], "next_cursor": ...}; the
+# cursor goes back as ?cursor= with the same filters. A malformed cursor, or
+# one issued for another ordering, raises InvalidCursor, which
+# install_handler() turns into HTTP 400 for a FastAPI app.
+import json, base64, binascii
+from datetime import date, datetime
+
+class InvalidCursor(ValueError):
+    def __init__(self, msg='invalid cursor'):
+        super().__init__(msg)
+
+def encode(key, tag=()):
+    """Cursor for `key` (a sequence of JSON values, dates as ISO text)."""
+    values = [*tag, *(v.isoformat() if isinstance(v, (date, datetime)) else v for v in key)]
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+def decode(cursor, types, tag=()):
+    """The key of `cursor`, one value per converter in `types`.
+
+    int parts must already be JSON integers; other parts go through their
+    converter, except None, which is kept (NULL sort values). The leading
+    `tag` must match what encode() was given.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor()
+    n = len(tag)
+    if not isinstance(values, list) or len(values) != n + len(types) or values[:n] != list(tag):
+        raise InvalidCursor()
+    key = []
+    for v, conv in zip(values[n:], types):
+        if conv is int:
+            if not isinstance(v, int) or isinstance(v, bool):
+                raise InvalidCursor()
+        elif v is not None:
+            try:
+                v = conv(v)
+            except (ValueError, TypeError):
+                raise InvalidCursor()
+        key.append(v)
+    return key
+
+def install_handler(app):
+    """Answer InvalidCursor with 400 {"detail": "invalid cursor"} on a FastAPI app."""
+    from fastapi.responses import JSONResponse
+
+    @app.exception_handler(InvalidCursor)
+    async def _invalid_cursor(request, exc):
+        return JSONResponse(status_code=400, content={'detail': str(exc)})
+    return app
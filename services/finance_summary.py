@@ -0,0 +1,102 @@
+# services/finance_summary.py
+# Materialized finance summary for /v1/finance/summary: all-time totals plus
+# rolling windows, computed in one aggregate pass over finance_daily and
+# kept in memory until finance_daily changes.
+#
+# Writes through the ORM (inserts/updates/deletes of FinanceDaily, and bulk
+# insert/update/delete statements against it) invalidate the cache as they
+# commit. Writers in other processes or raw SQL are not seen here, so an
+# entry also expires after VEGA_FINANCE_SUMMARY_TTL seconds.
+import os, time, threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, event, func, select
+from sqlalchemy.orm import Session, object_session
+
+from models import FinanceDaily
+
+# Rolling windows in days, each ending today (UTC)
+WINDOWS = tuple(sorted({int(w) for w in os.getenv('VEGA_FINANCE_WINDOWS', '7,30,90').split(',') if w.strip()}))
+TTL = float(os.getenv('VEGA_FINANCE_SUMMARY_TTL', '300'))
+MEASURES = ('units', 'revenue', 'cogs', 'fees', 'ad_spend')
+
+_lock = threading.Lock()
+_generation = 0
+_cache = None   # (generation, utc day, computed at, summary)
+
+# ---- invalidation ----
+def invalidate():
+    global _generation
+    with _lock:
+        _generation += 1
+
+def _mark(session):
+    # Bump now (this process' readers) and again on commit, so a reader
+    # that computed between flush and commit cannot keep the old totals
+    if session is not None:
+        session.info['finance_dirty'] = True
+    invalidate()
+
+@event.listens_for(FinanceDaily, 'after_insert')
+@event.listens_for(FinanceDaily, 'after_update')
+@event.listens_for(FinanceDaily, 'after_delete')
+def _on_row_write(mapper, connection, target):
+    _mark(object_session(target))
+
+# AsyncSession runs on a plain Session underneath, so these see its writes too
+@event.listens_for(Session, 'do_orm_execute')
+def _on_bulk_write(state):
+    if (state.is_insert or state.is_update or state.is_delete) and state.bind_mapper is FinanceDaily.__mapper__:
+        _mark(state.session)
+
+@event.listens_for(Session, 'after_commit')
+@event.listens_for(Session, 'after_rollback')
+def _on_end(session):
+    if session.info.pop('finance_dirty', False):
+        invalidate()
+
+# ---- summary ----
+def _totals(row):
+    units, rev, cogs, fees, ads = (v or 0 for v in row)
+    gross = rev - cogs - fees
+    return {
+        'units': int(units),
+        'revenue': rev,
+        'gross_profit': gross,
+        'net_profit': gross - ads,
+        'ad_spend': ads,
+        'acos_pct': (ads / rev * 100.0) if rev > 1e-9 else 0.0,
+    }
+
+async def compute(sess, today=None):
+    """All-time and per-window totals from a single SELECT over finance_daily."""
+    today = today or datetime.utcnow().date()
+    midnight = datetime.combine(today, datetime.min.time())
+    cols = [func.sum(getattr(FinanceDaily, m)) for m in MEASURES]
+    for w in WINDOWS:
+        since = midnight - timedelta(days=w - 1)
+        cols += [func.sum(case((FinanceDaily.date >= since, getattr(FinanceDaily, m)))) for m in MEASURES]
+    row = (await sess.execute(select(*cols))).one()
+    n = len(MEASURES)
+    out = _totals(row[:n])
+    out['windows'] = {f'{w}d': _totals(row[n * (i + 1):n * (i + 2)]) for i, w in enumerate(WINDOWS)}
+    out['as_of'] = today.isoformat()
+    return out
+
+async def get(session_factory):
+    """The cached summary, recomputed when finance_daily changed, the UTC
+    day rolled over (windows end today) or the entry is older than TTL."""
+    global _cache
+    today = datetime.utcnow().date()
+    with _lock:
+        gen, hit = _generation, _cache
+    if hit and hit[0] == gen and hit[1] == today and time.monotonic() - hit[2] < TTL:
+        return hit[3]
+    async with session_factory() as sess:
+        summary = await compute(sess, today)
+    with _lock:
+        # A write that landed while computing leaves the entry stale; keep it
+        # out of the cache so the next call recomputes
+        if _generation == gen:
+            _cache = (gen, today, time.monotonic(), summary)
+    return summary
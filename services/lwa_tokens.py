@@ -0,0 +1,129 @@
+# services/lwa_tokens.py
+# One LWA access-token broker for every Ads/SP-API caller. Tokens are cached
+# in memory and in a file-locked JSON file shared by the Streamlit app, the
+# API and cron workers, refreshed REFRESH_SKEW seconds before expiry, and
+# refreshed by one caller at a time (per process and across processes).
+import os, json, time, hashlib, tempfile, threading
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:  # Windows dev boxes: in-process single-flight only
+    fcntl = None
+
+LWA_TOKEN_URL = 'https://api.amazon.com/auth/o2/token'
+CACHE_PATH   = os.getenv('VEGA_LWA_CACHE', os.path.join(tempfile.gettempdir(), 'vega_lwa_tokens.json'))
+REFRESH_SKEW = int(os.getenv('VEGA_LWA_REFRESH_SKEW', '300'))
+
+class TokenError(RuntimeError):
+    pass
+
+_mem = {}
+_locks = {}
+_locks_guard = threading.Lock()
+
+def _key(client_id, refresh_token):
+    # Never store the refresh token itself, only a digest to key on
+    return hashlib.sha256(f'{client_id}:{refresh_token}'.encode()).hexdigest()[:32]
+
+def _fresh(ent, now=None):
+    return bool(ent) and ent.get('exp', 0) - REFRESH_SKEW > (now or time.time())
+
+def _thread_lock(key):
+    with _locks_guard:
+        return _locks.setdefault(key, threading.Lock())
+
+@contextmanager
+def _file_lock():
+    if fcntl is None:
+        yield
+        return
+    # No symlink following on a predictable name in a shared directory
+    fd = os.open(CACHE_PATH + '.lock', os.O_RDWR | os.O_CREAT | os.O_NOFOLLOW, 0o600)
+    with os.fdopen(fd, 'r+') as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+def _read():
+    try:
+        with open(CACHE_PATH, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _write(cache):
+    now = time.time()
+    cache = {k: v for k, v in cache.items() if v.get('exp', 0) > now}
+    # mkstemp: a fresh 0600 file with an unguessable name (O_EXCL), so a
+    # planted file or symlink in a shared temp dir can't be written through
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(CACHE_PATH) + '.', suffix='.tmp',
+                               dir=os.path.dirname(CACHE_PATH) or '.')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(tmp, CACHE_PATH)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def _fetch(client_id, client_secret, refresh_token, timeout):
+    import requests  # deferred: only refreshes pay its import cost
+    r = requests.post(LWA_TOKEN_URL, data={
+        'grant_type': 'refresh_token',
+        'refresh_token': refresh_token,
+        'client_id': client_id,
+        'client_secret': client_secret,
+    }, timeout=timeout)
+    if r.status_code != 200:
+        raise TokenError(f'LWA token failed: {r.status_code} {r.text[:200]}')
+    j = r.json()
+    if not j.get('access_token'):
+        raise TokenError('no access_token in LWA response')
+    return {'val': j['access_token'], 'exp': time.time() + int(j.get('expires_in', 3600))}
+
+def get_access_token(client_id, client_secret, refresh_token, timeout=20):
+    """Return a valid access token, refreshing through LWA only when needed."""
+    if not all([client_id, client_secret, refresh_token]):
+        raise TokenError('missing LWA client_id / client_secret / refresh_token')
+    key = _key(client_id, refresh_token)
+    ent = _mem.get(key)
+    if _fresh(ent):
+        return ent['val']
+    with _thread_lock(key):
+        ent = _mem.get(key)
+        if _fresh(ent):
+            return ent['val']
+        with _file_lock():
+            cache = _read()
+            ent = cache.get(key)
+            if not _fresh(ent):
+                ent = _fetch(client_id, client_secret, refresh_token, timeout)
+                cache[key] = ent
+                try:
+                    _write(cache)
+                except OSError:
+                    pass  # read-only tmp: still cached in memory
+        _mem[key] = ent
+        return ent['val']
+
+def invalidate(client_id, refresh_token, token):
+    """Drop `token` after a 401 so the next get refreshes.
+
+    Only drops the entry if it still holds that token, so concurrent callers
+    that already refreshed are not forced into another LWA round-trip.
+    """
+    key = _key(client_id, refresh_token)
+    with _thread_lock(key):
+        if (_mem.get(key) or {}).get('val') == token:
+            _mem.pop(key, None)
+        with _file_lock():
+            cache = _read()
+            if (cache.get(key) or {}).get('val') == token:
+                cache.pop(key, None)
+                try:
+                    _write(cache)
+                except OSError:
+                    pass
@@ -0,0 +1,85 @@
+# services/streaming_export.py
+# Chunked encoders for the /v1/export endpoints. Rows arrive as plain
+# tuples in chunks (an async iterable) from a server-side cursor and leave
+# as NDJSON, CSV or Arrow IPC stream bytes, one chunk at a time, so memory
+# stays flat however many rows are exported. No per-row model validation
+# on this path.
+#
+# Columns are (name, type) with type one of 'int', 'float', 'str', 'ts'.
+import io, os, csv, json
+from datetime import date, datetime
+
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except Exception:
+    PYARROW_AVAILABLE = False
+
+CHUNK_ROWS = int(os.getenv('VEGA_EXPORT_CHUNK_ROWS', '5000'))
+
+MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv; charset=utf-8',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+EXTENSIONS = {'ndjson': 'ndjson', 'csv': 'csv', 'arrow': 'arrows'}
+
+def _iso(v):
+    return v.isoformat() if isinstance(v, (date, datetime)) else v
+
+async def ndjson(columns, chunks):
+    names = [n for n, _ in columns]
+    ts = [i for i, (_, t) in enumerate(columns) if t == 'ts']
+    dumps = json.JSONEncoder(separators=(',', ':'), default=_iso).encode
+    async for chunk in chunks:
+        lines = []
+        for row in chunk:
+            if ts:
+                row = list(row)
+                for i in ts:
+                    row[i] = _iso(row[i])
+            lines.append(dumps(dict(zip(names, row))))
+        if lines:
+            yield ('\n'.join(lines) + '\n').encode()
+
+async def csv_rows(columns, chunks):
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow([n for n, _ in columns])
+    ts = [i for i, (_, t) in enumerate(columns) if t == 'ts']
+    async for chunk in chunks:
+        if ts:
+            chunk = [[_iso(v) if i in ts else v for i, v in enumerate(row)] for row in chunk]
+        w.writerows(chunk)
+        yield buf.getvalue().encode()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue().encode()
+
+def _arrow_schema(columns):
+    types = {'int': pa.int64(), 'float': pa.float64(), 'str': pa.string(), 'ts': pa.timestamp('us', tz='UTC')}
+    return pa.schema([(n, types[t]) for n, t in columns])
+
+async def arrow(columns, chunks):
+    """Arrow IPC stream: the schema, then one record batch per chunk."""
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError('pyarrow is required for Arrow export (pip install pyarrow)')
+    schema = _arrow_schema(columns)
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            cols = list(zip(*chunk))
+            writer.write_batch(pa.record_batch([pa.array(c, type=f.type) for c, f in zip(cols, schema)], schema=schema))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    # Schema-only stream for an empty export, plus the end-of-stream marker
+    yield sink.getvalue()
+
+ENCODERS = {'ndjson': ndjson, 'csv': csv_rows, 'arrow': arrow}
+
+def encode(fmt, columns, chunks):
+    return ENCODERS[fmt](columns, chunks)
@@ -15,13 +15,8 @@ from __future__ import annotations
 import os, typing as T, requests, pandas as pd, streamlit as st
 from dataclasses import dataclass
 from tenacity import retry, stop_after_attempt, wait_exponential
-
-LWA_TOKEN_URL = "https://api.amazon.com/auth/o2/token"
-REGION_BASE = {
-    "na": "https://advertising-api.amazon.com",
-    "eu": "https://advertising-api-eu.amazon.com",
-    "fe": "https://advertising-api-fe.amazon.com",
-}
+from services import lwa_tokens
+from services.ads_profiles import REGION_BASE
 
 @dataclass
 class AdsCredentials:
@@ -76,16 +71,8 @@ def region_base() -> str:
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential(min=1, max=8), reraise=True)
 def fetch_access_token(creds: AdsCredentials) -> str:
-    data = {
-        "grant_type": "refresh_token",
-        "refresh_token": creds.refresh_token,
-        "client_id": creds.client_id,
-        "client_secret": creds.client_secret,
-    }
-    r = requests.post(LWA_TOKEN_URL, data=data, timeout=20)
-    if r.status_code != 200:
-        raise RuntimeError(f"LWA token failed: {r.status_code} {r.text[:200]}")
-    return r.json()["access_token"]
+    """Cached LWA token via the shared broker (services.lwa_tokens)."""
+    return lwa_tokens.get_access_token(creds.client_id, creds.client_secret, creds.refresh_token)
 
 def headers(access_token: str, client_id: str, profile_id: T.Optional[str] = None) -> dict:
     h = {
@@ -117,7 +104,6 @@ def quick_test() -> dict:
 class AdsClient:
     def __init__(self):
         self.creds = load_creds()
-        self._access_token: T.Optional[str] = None
 
     @property
     def region_base(self) -> str:
@@ -129,9 +115,8 @@ class AdsClient:
     def _token(self) -> str:
         if not self.available():
             raise RuntimeError("Missing SP-API/LWA secrets")
-        if not self._access_token:
-            self._access_token = fetch_access_token(self.creds)
-        return self._access_token
+        # The broker caches and refreshes before expiry; no per-client copy
+        return fetch_access_token(self.creds)
 
     def get_profiles(self) -> pd.DataFrame:
         if not self.available():
@@ -15,25 +15,14 @@ def get_access_token() -> t.Tuple[str, str]:
     Exchanges ADS_REFRESH_TOKEN for an LWA access token (Advertising scope).
     Returns (status, token_or_message)
     """
-    import requests
+    from services import lwa_tokens
     cid = _env("ADS_LWA_CLIENT_ID")
     secret = _env("ADS_LWA_CLIENT_SECRET")
     refresh = _env("ADS_REFRESH_TOKEN")
     if not all([cid, secret, refresh]):
         return ("skipped", "Missing ADS_LWA_CLIENT_ID / ADS_LWA_CLIENT_SECRET / ADS_REFRESH_TOKEN")
     try:
-        resp = requests.post("https://api.amazon.com/auth/o2/token", data={
-            "grant_type": "refresh_token",
-            "refresh_token": refresh,
-            "client_id": cid,
-            "client_secret": secret
-        }, timeout=20)
-        if resp.status_code == 200:
-            tok = resp.json().get("access_token")
-            if tok:
-                return ("ok", tok)
-            return ("error", "no access_token in response")
-        return ("error", f"token status {resp.status_code}: {resp.text[:200]}")
+        return ("ok", lwa_tokens.get_access_token(cid, secret, refresh))
     except Exception as e:
         return ("error", str(e))
 
@@ -46,12 +46,17 @@ def api_get(path: str, timeout: float = 15.0) -> Tuple[bool, Any]:
 def health() -> Tuple[bool, Any]:
     return api_get("/health")
 
+def _items(res: Tuple[bool, Any]) -> Tuple[bool, Any]:
+    # Paged endpoints answer {"items": [...], "next_cursor": ...}
+    ok, payload = res
+    return (ok, payload["items"]) if ok and isinstance(payload, dict) and "items" in payload else res
+
 def list_products(limit: int = 50, offset: int = 0) -> Tuple[bool, Any]:
-    return api_get(f"/v1/products?limit={limit}&offset={offset}")
+    return _items(api_get(f"/v1/products?limit={limit}&offset={offset}"))
 
 def finance_summary():
     return api_get("/v1/finance/summary")
 
 def finance_daily(limit: int = 60):
-    return api_get(f"/v1/finance/daily?limit={limit}")
+    return _items(api_get(f"/v1/finance/daily?limit={limit}"))
 
@@ -3,32 +3,39 @@ import io
 import pandas as pd
 from datetime import datetime
 from services.amazon_ads_service import _db
+from services import ads_db
 
 def export_finance_monthly(year: int, month: int) -> bytes:
     prefix = f"{year:04d}-{month:02d}"
+    lo, hi = ads_db.month_bounds(year * 100 + month)
     con = _db()
+    # Integer day range on metrics_v2 itself (the legacy view has no day
+    # column): an index seek, not a full scan
     df = pd.read_sql_query(
-        "SELECT date, adType, campaignId, campaignName, impressions, clicks, cost, sales14d "
-        "FROM metrics WHERE substr(date,1,7)=? ORDER BY date, adType, campaignName",
-        con, params=[prefix]
+        "SELECT date(f.day * 86400, 'unixepoch') AS date, c.adType, CAST(c.campaignId AS TEXT) AS campaignId, "
+        "c.campaignName, f.impressions, f.clicks, f.cost, f.sales14d "
+        f"FROM {ads_db.METRICS.from_sql} WHERE f.day BETWEEN ? AND ? ORDER BY f.day, c.adType, c.campaignName",
+        con, params=[lo, hi]
     )
+    # Monthly totals come from the rollup, not a second pass over the rows
+    total = con.execute(
+        "SELECT COALESCE(SUM(impressions),0), COALESCE(SUM(clicks),0), COALESCE(SUM(cost),0), COALESCE(SUM(sales14d),0) "
+        "FROM metrics_campaign_month WHERE month=?", (year * 100 + month,)
+    ).fetchone()
     con.close()
     if df.empty:
         return pd.DataFrame(columns=[
             "date","adType","campaignId","campaignName","impressions","clicks","cost","sales14d"
         ]).to_csv(index=False).encode("utf-8")
-    for col in ["impressions","clicks","cost","sales14d"]:
-        df[col] = pd.to_numeric(df[col], errors="coerce").fillna(0)
-    total = df[["impressions","clicks","cost","sales14d"]].sum(numeric_only=True)
     summary = pd.DataFrame({
         "date": [prefix],
         "adType": ["ALL"],
         "campaignId": ["-"],
         "campaignName": ["Monthly totals"],
-        "impressions": [int(total["impressions"])],
-        "clicks": [int(total["clicks"])],
-        "cost": [float(total["cost"])],
-        "sales14d": [float(total["sales14d"])],
+        "impressions": [int(total[0])],
+        "clicks": [int(total[1])],
+        "cost": [float(total[2])],
+        "sales14d": [float(total[3])],
     })
     out = pd.concat([df, summary], ignore_index=True)
     buf = io.BytesIO()
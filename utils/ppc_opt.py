@@ -56,10 +56,12 @@ def bid_rules(kw_df: pd.DataFrame, acos_target: float = 30.0, min_clicks: int =
         elif acos <= acos_target and orders >= 3:
             actions.append(PPCAction("Keyword", kw, "Raise Bid", f"Profitable: ACoS {acos:.1f}% ≤ target, {int(orders)} orders", amount=0.10, campaign=camp, match_type=mt))
         elif acos > acos_target*1.5 and orders <= 1:
+            # Spend with no sales comes in as a capped sentinel ACoS; say so
+            high = f"No sales on {float(r.get('Spend', 0)):.2f} spend" if float(r.get("Sales", 1) or 0) == 0 else f"High ACoS {acos:.1f}%"
             if clicks >= 50:
-                actions.append(PPCAction("Keyword", kw, "Pause", f"High ACoS {acos:.1f}% with {int(clicks)} clicks and {int(orders)} orders", campaign=camp, match_type=mt))
+                actions.append(PPCAction("Keyword", kw, "Pause", f"{high} with {int(clicks)} clicks and {int(orders)} orders", campaign=camp, match_type=mt))
             else:
-                actions.append(PPCAction("Keyword", kw, "Lower Bid", f"High ACoS {acos:.1f}% with low orders {int(orders)}", amount=0.20, campaign=camp, match_type=mt))
+                actions.append(PPCAction("Keyword", kw, "Lower Bid", f"{high} with low orders {int(orders)}", amount=0.20, campaign=camp, match_type=mt))
     return actions
 
 def negatives(df: pd.DataFrame, ctr_floor: float = 0.10, min_impr: int = 2000) -> List[PPCAction]: